@@ -0,0 +1,185 @@
+"""
+Control de admisión para /webhook/submit
+
+Limita los envíos procesándose a la vez (ADMISSION_MAX_INFLIGHT). Los que
+llegan con todo ocupado esperan en una cola corta y FIFO; si la cola está
+llena, si la espera pasa de ADMISSION_MAX_WAIT_MS o si la cola lleva un
+rato con demora alta, se rechazan de inmediato con 503 y Retry-After en
+vez de acumularse.
+
+La última condición es la de CoDel: se mide cuánto esperó cada petición
+admitida desde la cola; si durante todo un intervalo
+(ADMISSION_INTERVAL_MS) la espera no bajó del objetivo
+(ADMISSION_TARGET_DELAY_MS), la cola ya no absorbe un pico sino que es
+una cola permanente, y se pasa a descartar las llegadas que tendrían que
+esperar hasta que la demora vuelva a bajar del objetivo.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+import metrics
+from json_body import dumps
+
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "50"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_TARGET_DELAY_MS = float(os.getenv("ADMISSION_TARGET_DELAY_MS", "100"))
+ADMISSION_INTERVAL_MS = float(os.getenv("ADMISSION_INTERVAL_MS", "500"))
+ADMISSION_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "2000"))
+
+admission_rejections = metrics.Counter(
+    "admission_rejections_total", "Envíos rechazados por sobrecarga", ("reason",)
+)
+admission_wait = metrics.Histogram(
+    "admission_wait_seconds", "Espera en la cola de admisión de los envíos admitidos"
+)
+
+
+class Overloaded(Exception):
+    """No hay capacidad para admitir el envío"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Args:
+        max_inflight: Envíos procesándose a la vez
+        max_queue: Envíos esperando como máximo
+        target_delay: Espera objetivo en cola (segundos)
+        interval: Tiempo por encima del objetivo antes de empezar a descartar
+        max_wait: Espera máxima de una petición en cola
+    """
+
+    def __init__(self, max_inflight: int = ADMISSION_MAX_INFLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 target_delay: float = ADMISSION_TARGET_DELAY_MS / 1000,
+                 interval: float = ADMISSION_INTERVAL_MS / 1000,
+                 max_wait: float = ADMISSION_MAX_WAIT_MS / 1000):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.target_delay = target_delay
+        self.interval = interval
+        self.max_wait = max_wait
+        self.inflight = 0
+        self._waiters: deque = deque()
+        self.dropping = False
+        self._first_above: Optional[float] = None
+        # Media móvil del tiempo de servicio, para estimar Retry-After
+        self._service_time = 0.5
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._service_time / self.max_inflight))
+
+    def _reject(self, reason: str) -> Overloaded:
+        admission_rejections.inc(reason)
+        return Overloaded(reason, self._retry_after())
+
+    def _observe_sojourn(self, sojourn: float, now: float) -> None:
+        """Estado CoDel a partir de la espera de la petición recién admitida"""
+        admission_wait.observe(sojourn)
+        if sojourn < self.target_delay:
+            self._first_above = None
+            self.dropping = False
+        elif self._first_above is None:
+            self._first_above = now + self.interval
+        elif now >= self._first_above:
+            self.dropping = True
+
+    async def acquire(self) -> float:
+        """Espera un hueco; devuelve el instante de admisión o lanza Overloaded"""
+        now = time.monotonic()
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            self._observe_sojourn(0.0, now)
+            return now
+        if self.dropping:
+            raise self._reject("codel")
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # El hueco ya se transfirió a esta petición: devolverlo
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        admitted = time.monotonic()
+        self._observe_sojourn(admitted - now, admitted)
+        return admitted
+
+    def release(self, admitted: Optional[float]) -> None:
+        """Libera el hueco (lo pasa al siguiente en cola, si lo hay)"""
+        if admitted is not None:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - admitted)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # El hueco pasa directamente: inflight no cambia
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "dropping": self.dropping,
+            "service_time_ms": round(self._service_time * 1000, 1),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI: aplica el control de admisión a los POST de las rutas
+    indicadas y responde 503 + Retry-After cuando no hay capacidad
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str]):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            admitted = await self.controller.acquire()
+        except Overloaded as e:
+            body = dumps({"status": "error", "message": "Servicio ocupado, intenta de nuevo en unos segundos"})
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(e.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(admitted)
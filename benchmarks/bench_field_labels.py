@@ -0,0 +1,93 @@
+"""
+Microbenchmark: etiquetas de tags (field_labels.label_for_key) frente al
+recorrido original de webhook_server.create_ghl_contact
+
+Verifica primero que ambas implementaciones producen exactamente las mismas
+etiquetas y luego mide el coste por campo con y sin LRU caliente.
+
+Uso:
+    python benchmarks/bench_field_labels.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_labels import FIELD_LABELS, clear_caches, label_for_key  # noqa: E402
+
+SEED = 1234
+
+
+def legacy_label(key: str) -> str:
+    """Implementación original (O(claves × etiquetas))"""
+    label = None
+    for field_key, field_label in FIELD_LABELS.items():
+        if field_key in key.lower():
+            label = field_label
+            break
+    if not label:
+        label = key.replace("_", " ").replace("-", " ").replace("dmform", "Campo").title()
+    return label
+
+
+def build_vocabulary(n: int, seed: int = SEED) -> list:
+    """Nombres de campo realistas: dmform-N, snake_case con palabras clave, libres"""
+    rng = random.Random(seed)
+    words = list(FIELD_LABELS) + [
+        "name", "notes", "message", "date", "type", "city", "zip", "quantity",
+        "destino", "Origin", "CARGO", "dimensions", "value", "incoterm",
+    ]
+    keys = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.3:
+            keys.append(f"dmform-{rng.randint(0, 40)}")
+        elif kind < 0.8:
+            parts = rng.sample(words, rng.randint(1, 3))
+            keys.append(rng.choice(["_", "-", ""]).join(parts))
+        else:
+            keys.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyz_-") for _ in range(rng.randint(3, 24))))
+    return keys
+
+
+def build_keys(n: int, vocabulary: int = 400, seed: int = SEED) -> list:
+    """Flujo de campos: los formularios repiten un conjunto acotado de nombres"""
+    rng = random.Random(seed)
+    names = build_vocabulary(vocabulary, seed)
+    return [rng.choice(names) for _ in range(n)]
+
+
+def main() -> None:
+    check = build_vocabulary(50_000, seed=SEED + 1)
+    mismatches = [k for k in check if legacy_label(k) != label_for_key(k)]
+    if mismatches:
+        raise SystemExit(f"❌ Etiquetas distintas para {len(mismatches)} campos, ej: {mismatches[:5]}")
+    print(f"✅ {len(check)} nombres de campo: etiquetas idénticas")
+
+    keys = build_keys(20_000)
+
+    unique = list(dict.fromkeys(keys))
+    number = 5
+
+    legacy = min(timeit.repeat(lambda: [legacy_label(k) for k in keys], number=number, repeat=5))
+
+    def cold():
+        clear_caches()
+        for k in unique:
+            label_for_key(k)
+
+    cold_time = min(timeit.repeat(cold, number=number, repeat=5))
+    warm = min(timeit.repeat(lambda: [label_for_key(k) for k in keys], number=number, repeat=5))
+
+    per_legacy = legacy / (number * len(keys)) * 1e9
+    per_cold = cold_time / (number * len(unique)) * 1e9
+    per_warm = warm / (number * len(keys)) * 1e9
+    print(f"legacy (substring scan): {per_legacy:8.1f} ns/campo")
+    print(f"regex precompilada:      {per_cold:8.1f} ns/campo (LRU frío)")
+    print(f"regex + LRU caliente:    {per_warm:8.1f} ns/campo  ({per_legacy / per_warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
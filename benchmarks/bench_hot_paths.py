@@ -0,0 +1,149 @@
+"""
+Microbenchmarks de las funciones puras del camino de cada envío
+
+Mide el coste por llamada de:
+
+    main.validate_form_data / validate_email / validate_phone / check_rate_limit
+    webhook_server.extract_form_data / build_contact_payload (tags y payload
+    de create_ghl_contact, sin llamar a GHL)
+
+con el corpus fijo de benchmarks/payloads.py (misma semilla = mismos
+datos) y timeit. El resultado es JSON para poder guardarlo por versión y
+comparar el coste de cada función entre releases.
+
+Uso:
+    python benchmarks/bench_hot_paths.py                    # JSON a stdout
+    python benchmarks/bench_hot_paths.py --output bench.json --repeat 7
+    python benchmarks/bench_hot_paths.py --only validate_email,check_rate_limit
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Las apps abren SQLite y configuran logging al importarse: todo a un
+# directorio temporal y sin logs por debajo de ERROR
+_workdir = tempfile.mkdtemp(prefix="jetcargo-bench-")
+os.environ.setdefault("SUBMISSION_QUEUE_PATH", os.path.join(_workdir, "submissions.db"))
+os.environ.setdefault("CONTACT_INDEX_PATH", os.path.join(_workdir, "contacts.db"))
+os.environ.setdefault("GHL_GOVERNOR_PATH", ":memory:")
+os.environ.setdefault("GOHIGHLEVEL_LOCATION_ID", "bench-location")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import main  # noqa: E402
+import webhook_server  # noqa: E402
+from benchmarks.payloads import SEED, build_corpus  # noqa: E402
+
+FIXTURE_SIZE = 1000
+
+
+def build_fixtures(seed: int) -> dict:
+    corpus = build_corpus(FIXTURE_SIZE, seed=seed)
+    payloads = [payload for _, payload in corpus]
+    rng = random.Random(seed)
+    return {
+        "payloads": payloads,
+        "emails": [str(payload.get("email", "")) for payload in payloads],
+        "phones": [str(payload.get("phone", "")) for payload in payloads],
+        # Pocas IPs repetidas muchas veces, como un sitio real con algunos abusos
+        "ips": [f"203.0.{rng.randint(0, 3)}.{rng.randint(1, 250)}" for _ in payloads],
+    }
+
+
+def benchmarks(fixtures: dict) -> dict:
+    """Nombre → (función sin argumentos que recorre el fixture, llamadas por ejecución)"""
+    payloads, emails, phones, ips = (
+        fixtures["payloads"], fixtures["emails"], fixtures["phones"], fixtures["ips"]
+    )
+
+    def run_validate_form_data():
+        for payload in payloads:
+            main.validate_form_data(payload)
+
+    def run_validate_email():
+        for email in emails:
+            main.validate_email(email)
+
+    def run_validate_phone():
+        for phone in phones:
+            main.validate_phone(phone)
+
+    def run_check_rate_limit():
+        for ip in ips:
+            main.check_rate_limit(ip, max_requests=5, time_window=3600)
+
+    def run_extract_form_data():
+        for payload in payloads:
+            webhook_server.extract_form_data(payload)
+
+    def run_build_contact_payload():
+        for payload in payloads:
+            webhook_server.build_contact_payload(payload)
+
+    return {
+        "validate_form_data": (run_validate_form_data, len(payloads)),
+        "validate_email": (run_validate_email, len(emails)),
+        "validate_phone": (run_validate_phone, len(phones)),
+        "check_rate_limit": (run_check_rate_limit, len(ips)),
+        "extract_form_data": (run_extract_form_data, len(payloads)),
+        "build_contact_payload": (run_build_contact_payload, len(payloads)),
+    }
+
+
+def measure(fn, calls: int, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = timer.repeat(repeat=repeat, number=number)
+    per_call = [t / (number * calls) * 1e9 for t in times]
+    return {
+        "ns_per_call": round(min(per_call), 1),
+        "mean_ns": round(statistics.mean(per_call), 1),
+        "stdev_ns": round(statistics.stdev(per_call), 1) if len(per_call) > 1 else 0.0,
+        "calls": number * calls * repeat,
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de las funciones del webhook")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="Lista separada por comas de benchmarks a correr")
+    parser.add_argument("--output", help="Guardar el JSON en este archivo")
+    args = parser.parse_args()
+
+    suite = benchmarks(build_fixtures(args.seed))
+    selected = args.only.split(",") if args.only else list(suite)
+    results = {}
+    for name in selected:
+        fn, calls = suite[name]
+        # check_rate_limit tiene estado: cada medición parte de un limitador vacío
+        if name == "check_rate_limit":
+            main.rate_limiter = main.SlidingWindowRateLimiter(main.RATE_LIMIT_MAX_KEYS)
+        results[name] = measure(fn, calls, args.repeat)
+        print(f"{name:24s} {results[name]['ns_per_call']:10.1f} ns/llamada", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "fixture_size": FIXTURE_SIZE,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
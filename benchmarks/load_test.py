@@ -0,0 +1,344 @@
+"""
+Prueba de carga de /webhook/submit contra un GoHighLevel simulado
+
+Levanta benchmarks/mock_ghl.py y la app indicada (main o webhook_server)
+con uvicorn en procesos aparte, envía el corpus de benchmarks/payloads.py
+con la concurrencia pedida y reporta:
+
+    throughput, latencia p50/p95/p99/max, códigos de estado,
+    CPU (segundos y % de un núcleo) y RSS máximo del proceso de la app
+
+Cada petición lleva un X-Forwarded-For distinto (uvicorn con
+--proxy-headers) para que el rate limit por IP de main.py no corte la
+prueba, igual que detrás del proxy de Railway.
+
+Baseline y regresiones:
+
+    python benchmarks/load_test.py --app main --save-baseline
+    python benchmarks/load_test.py --app main --compare      # exit 1 si empeora
+
+La baseline se guarda en benchmarks/baselines/<app>.json. --compare falla
+si p50/p95/p99 suben, o el throughput baja, más de --tolerance (20%), o
+si p99 supera --p99-budget-ms. Las baselines dependen de la máquina: hay
+que generarlas en la misma donde se compara.
+
+Las baselines del repo (main y webhook_server, 1000 peticiones con
+concurrencia 50) se comprueban con el test opt-in:
+
+    LOAD_TEST=1 python -m pytest -q tests/test_load_regression.py
+
+que repite la configuración guardada en cada baseline y falla con las
+mismas reglas que --compare (tolerancia en LOAD_TEST_TOLERANCE).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.payloads import SEED, build_corpus  # noqa: E402
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+# Estados de la cola de main.py que aún no llegaron a GHL
+PENDING_STATUSES = ("pending", "contact_created", "opportunity_created")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ProcessSampler:
+    """CPU y RSS de un proceso (psutil si está instalado; si no, /proc)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss = 0
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self) -> Optional[float]:
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system
+        try:
+            with open(f"/proc/{self.pid}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks
+        except OSError:
+            return None
+
+    def sample_rss(self) -> None:
+        rss = None
+        if self._process is not None:
+            rss = self._process.memory_info().rss
+        else:
+            try:
+                with open(f"/proc/{self.pid}/status") as status:
+                    for line in status:
+                        if line.startswith("VmRSS:"):
+                            rss = int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                pass
+        if rss:
+            self.peak_rss = max(self.peak_rss, rss)
+
+
+def start_process(args: List[str], env: dict, port: int, ready_path: str, timeout: float = 20.0) -> subprocess.Popen:
+    process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El proceso terminó al arrancar: {' '.join(args)}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}{ready_path}", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"El proceso no respondió en {timeout}s: {' '.join(args)}")
+
+
+async def drive(url: str, corpus: list, concurrency: int, sampler: ProcessSampler, seed: int) -> dict:
+    """Envía el corpus con `concurrency` clientes; devuelve latencias y estados"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    by_kind: dict = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    rng = random.Random(seed)
+    for index, (kind, payload) in enumerate(corpus):
+        client_ip = f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{index % 250 + 1}"
+        queue.put_nowait((kind, payload, client_ip))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120.0) as client:
+        async def worker():
+            while True:
+                try:
+                    kind, payload, client_ip = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload, headers={"X-Forwarded-For": client_ip})
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - started
+                latencies.append(elapsed)
+                by_kind.setdefault(kind, []).append(elapsed)
+                statuses[status] += 1
+
+        async def rss_sampler():
+            while True:
+                sampler.sample_rss()
+                await asyncio.sleep(0.2)
+
+        sampling = asyncio.create_task(rss_sampler())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+        sampling.cancel()
+
+    return {"latencies": latencies, "statuses": statuses, "by_kind": by_kind, "duration": duration}
+
+
+def wait_for_drain(base_url: str, timeout: float) -> Optional[float]:
+    """main.py: espera a que la cola no tenga envíos por entregar"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        queue = httpx.get(f"{base_url}/health", timeout=5).json().get("queue", {})
+        if not any(queue.get(status) for status in PENDING_STATUSES):
+            return time.perf_counter() - started
+        time.sleep(0.25)
+    return None
+
+
+def summarize(run: dict, cpu_seconds: Optional[float], peak_rss: int, drain_seconds: Optional[float]) -> dict:
+    latencies = sorted(run["latencies"])
+    ms = lambda value: round(value * 1000, 2)  # noqa: E731
+    result = {
+        "requests": len(latencies),
+        "duration_s": round(run["duration"], 3),
+        "throughput_rps": round(len(latencies) / run["duration"], 1) if run["duration"] else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+        "latency_p50_by_kind_ms": {
+            kind: ms(percentile(sorted(values), 50)) for kind, values in sorted(run["by_kind"].items())
+        },
+        "statuses": dict(run["statuses"]),
+        "cpu_seconds": round(cpu_seconds, 3) if cpu_seconds is not None else None,
+        "cpu_percent": round(100 * cpu_seconds / run["duration"], 1) if cpu_seconds is not None else None,
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss else None,
+    }
+    if drain_seconds is not None:
+        result["queue_drain_s"] = round(drain_seconds, 3)
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regresiones frente a la baseline (lista vacía = OK)"""
+    failures = []
+    for key in ("p50", "p95", "p99"):
+        before, after = baseline["latency_ms"][key], result["latency_ms"][key]
+        if before and after > before * (1 + tolerance):
+            failures.append(f"{key} {after}ms > {before}ms (+{tolerance:.0%})")
+    before, after = baseline["throughput_rps"], result["throughput_rps"]
+    if before and after < before * (1 - tolerance):
+        failures.append(f"throughput {after} rps < {before} rps (-{tolerance:.0%})")
+    return failures
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prueba de carga de /webhook/submit")
+    parser.add_argument("--app", choices=["main", "webhook_server"], default="main")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--ghl-latency", default="lognormal:0.08,0.5")
+    parser.add_argument("--ghl-quota", default=None)
+    parser.add_argument("--ghl-error-rate", type=float, default=0.0)
+    parser.add_argument("--ghl-timeout-rate", type=float, default=0.0)
+    parser.add_argument("--ghl-rate", default="1000", help="GHL_RATE_PER_SECOND de la app")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--no-drain", action="store_true", help="main: no esperar a vaciar la cola")
+    parser.add_argument("--drain-timeout", type=float, default=300.0)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--baseline", help="Ruta de la baseline (por defecto benchmarks/baselines/<app>.json)")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--p99-budget-ms", type=float, default=None)
+    parser.add_argument("--output", help="Guardar el resultado en este JSON")
+    return parser.parse_args(argv)
+
+
+def args_for_config(config: dict) -> List[str]:
+    """Argumentos de CLI que reproducen la configuración de una baseline"""
+    argv = ["--app", config["app"], "--requests", str(config["requests"]),
+            "--concurrency", str(config["concurrency"]), "--seed", str(config["seed"]),
+            "--ghl-latency", config["ghl_latency"],
+            "--ghl-error-rate", str(config["ghl_error_rate"]),
+            "--ghl-timeout-rate", str(config["ghl_timeout_rate"])]
+    if config.get("ghl_quota"):
+        argv += ["--ghl-quota", config["ghl_quota"]]
+    return argv
+
+
+def run_load_test(args: argparse.Namespace) -> dict:
+    """Levanta el mock y la app, envía el corpus y devuelve el resumen"""
+    corpus = build_corpus(args.requests, seed=args.seed)
+    mock_port, app_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="jetcargo-load-")
+
+    mock = start_process(
+        [sys.executable, "benchmarks/mock_ghl.py", "--port", str(mock_port), "--latency", args.ghl_latency,
+         "--error-rate", str(args.ghl_error_rate), "--timeout-rate", str(args.ghl_timeout_rate),
+         "--seed", str(args.seed)] + (["--quota", args.ghl_quota] if args.ghl_quota else []),
+        dict(os.environ), mock_port, "/__mock/stats",
+    )
+    app_env = dict(
+        os.environ,
+        GOHIGHLEVEL_API_BASE=f"http://127.0.0.1:{mock_port}",
+        GOHIGHLEVEL_API_KEY="load-test",
+        GOHIGHLEVEL_LOCATION_ID="load-test",
+        SUBMISSION_QUEUE_PATH=os.path.join(workdir, "submissions.db"),
+        CONTACT_INDEX_PATH=os.path.join(workdir, "contacts.db"),
+        GHL_GOVERNOR_PATH=os.path.join(workdir, "ghl_governor.db"),
+        GHL_RATE_PER_SECOND=args.ghl_rate,
+        GHL_RATE_BURST=args.ghl_rate,
+        LOG_LEVEL=args.log_level,
+    )
+    app = None
+    try:
+        app = start_process(
+            [sys.executable, "-m", "uvicorn", f"{args.app}:app", "--port", str(app_port),
+             "--proxy-headers", "--forwarded-allow-ips", "*", "--log-level", "warning", "--no-access-log"],
+            app_env, app_port, "/",
+        )
+        sampler = ProcessSampler(app.pid)
+        cpu_before = sampler.cpu_seconds()
+        base_url = f"http://127.0.0.1:{app_port}"
+        run = asyncio.run(drive(f"{base_url}/webhook/submit", corpus, args.concurrency, sampler, args.seed))
+        drain = None
+        if args.app == "main" and not args.no_drain:
+            drain = wait_for_drain(base_url, args.drain_timeout)
+        cpu_after = sampler.cpu_seconds()
+        sampler.sample_rss()
+        cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        result = summarize(run, cpu, sampler.peak_rss, drain)
+        result["ghl"] = httpx.get(f"http://127.0.0.1:{mock_port}/__mock/stats", timeout=5).json()
+    finally:
+        for process in (app, mock):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    result["config"] = {
+        "app": args.app, "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        "ghl_latency": args.ghl_latency, "ghl_quota": args.ghl_quota,
+        "ghl_error_rate": args.ghl_error_rate, "ghl_timeout_rate": args.ghl_timeout_rate,
+    }
+    return result
+
+
+def main() -> None:
+    args = parse_args()
+    result = run_load_test(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2, ensure_ascii=False)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.app}.json")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as output:
+            json.dump(result, output, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline guardada en {baseline_path}")
+    failures = []
+    if args.compare:
+        with open(baseline_path) as source:
+            baseline = json.load(source)
+        if baseline.get("config") != result["config"]:
+            print("⚠️ La baseline se generó con otra configuración; la comparación puede no ser válida")
+        failures = compare(result, baseline, args.tolerance)
+    if args.p99_budget_ms is not None and result["latency_ms"]["p99"] > args.p99_budget_ms:
+        failures.append(f"p99 {result['latency_ms']['p99']}ms > presupuesto {args.p99_budget_ms}ms")
+    if failures:
+        print("❌ Regresión de rendimiento:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    if args.compare or args.p99_budget_ms is not None:
+        print("✅ Sin regresiones de rendimiento")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Servidor local que imita la API de GoHighLevel para pruebas de carga
+
+Implementa solo lo que usa el webhook:
+
+    POST /contacts/                        (400 + meta.contactId si el email/teléfono ya existe)
+    GET  /contacts/?email=...              (búsqueda de duplicados)
+    POST /opportunities/                   (400 "Contact not found" si el contactId no existe)
+    GET  /locations/{id}/customFields
+
+y permite inyectar latencia, cuota (429 con cabeceras X-RateLimit-*),
+errores 5xx y timeouts, con una semilla fija para que cada corrida sea
+reproducible.
+
+En el mismo proceso (sin red):
+
+    from benchmarks.mock_ghl import MockGHLConfig, install
+    mock = install(MockGHLConfig(latency="lognormal:0.08,0.4", error_rate=0.02))
+
+Como servidor aparte:
+
+    python benchmarks/mock_ghl.py --port 9000 --latency lognormal:0.08,0.4 --quota 100/10000
+    GOHIGHLEVEL_API_BASE=http://127.0.0.1:9000 uvicorn webhook_server:app
+
+Estadísticas en GET /__mock/stats; POST /__mock/reset borra contactos y
+contadores.
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DEFAULT_CUSTOM_FIELDS = [
+    {"id": "cf_service_type", "name": "service_type", "fieldKey": "contact.service_type"},
+    {"id": "cf_express_air_freight", "name": "express_air_freight", "fieldKey": "contact.express_air_freight"},
+    {"id": "cf_charter_flights", "name": "charter_flights", "fieldKey": "contact.charter_flights"},
+    {"id": "cf_general_contact", "name": "general_contact", "fieldKey": "contact.general_contact"},
+]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Distribución de latencia en segundos a partir de un texto:
+
+        fixed:0.05             siempre 50 ms
+        uniform:0.02,0.2       uniforme entre 20 y 200 ms
+        lognormal:0.08,0.5     mediana 80 ms, sigma 0.5 (cola larga)
+        none                   sin latencia
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    if kind in ("none", ""):
+        return lambda rng: 0.0
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values
+        mu = math.log(median)
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+
+@dataclass
+class MockGHLConfig:
+    # Latencia por defecto y por endpoint (contacts, contacts_search, opportunities, custom_fields)
+    latency: str = "none"
+    endpoint_latency: Dict[str, str] = field(default_factory=dict)
+    # Cuota "peticiones/intervalo_ms" por ventana fija, ej "100/10000"; None = sin límite
+    quota: Optional[str] = None
+    # Probabilidades por petición
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    # Cuánto "cuelga" una petición que simula timeout
+    timeout_seconds: float = 60.0
+    custom_fields: list = field(default_factory=lambda: list(DEFAULT_CUSTOM_FIELDS))
+    seed: int = 1234
+
+
+class MockGHL:
+    """Estado del servidor simulado: contactos, cuota y contadores"""
+
+    def __init__(self, config: MockGHLConfig):
+        self.config = config
+        self._default_latency = parse_latency(config.latency)
+        self._latency = {name: parse_latency(spec) for name, spec in config.endpoint_latency.items()}
+        self.quota_max: Optional[int] = None
+        self.quota_interval = 0.0
+        if config.quota:
+            limit, _, interval_ms = config.quota.partition("/")
+            self.quota_max = int(limit)
+            self.quota_interval = float(interval_ms or 1000) / 1000.0
+        self.reset()
+
+    def reset(self) -> None:
+        self.rng = random.Random(self.config.seed)
+        self._ids = itertools.count(1)
+        self.contacts: Dict[str, dict] = {}
+        self.by_identity: Dict[str, str] = {}
+        self.opportunities = 0
+        self.stats: Counter = Counter()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def _next_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self._ids):08d}"
+
+    def _quota_headers(self) -> Optional[dict]:
+        """Cuenta la petición en la ventana; devuelve las cabeceras X-RateLimit-*"""
+        if self.quota_max is None:
+            return None
+        now = time.monotonic()
+        if now - self._window_start >= self.quota_interval:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        return {
+            "X-RateLimit-Max": str(self.quota_max),
+            "X-RateLimit-Remaining": str(max(0, self.quota_max - self._window_count)),
+            "X-RateLimit-Interval-Milliseconds": str(int(self.quota_interval * 1000)),
+        }
+
+    def _retry_after(self) -> str:
+        remaining = self.quota_interval - (time.monotonic() - self._window_start)
+        return str(max(1, math.ceil(remaining)))
+
+    async def respond(self, endpoint: str, handler: Callable[[], JSONResponse]) -> JSONResponse:
+        """Aplica cuota, fallos y latencia alrededor del handler real"""
+        headers = self._quota_headers()
+        if headers is not None and self._window_count > self.quota_max:
+            self.stats[f"{endpoint}:429"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"message": "Too many requests"},
+                headers={**headers, "Retry-After": self._retry_after()},
+            )
+
+        roll = self.rng.random()
+        latency = self._latency.get(endpoint, self._default_latency)(self.rng)
+        if roll < self.config.timeout_rate:
+            self.stats[f"{endpoint}:timeout"] += 1
+            await asyncio.sleep(self.config.timeout_seconds)
+        elif latency > 0:
+            await asyncio.sleep(latency)
+
+        if roll < self.config.timeout_rate + self.config.error_rate:
+            status = self.rng.choice((500, 502, 503, 504))
+            self.stats[f"{endpoint}:{status}"] += 1
+            return JSONResponse(status_code=status, content={"message": "Internal Server Error"}, headers=headers)
+
+        response = handler()
+        if headers:
+            response.headers.update(headers)
+        self.stats[f"{endpoint}:{response.status_code}"] += 1
+        return response
+
+    def create_contact(self, body: dict) -> JSONResponse:
+        identities = [
+            f"email:{body['email'].strip().lower()}" if body.get("email") else None,
+            f"phone:{''.join(ch for ch in str(body['phone']) if ch.isdigit())}" if body.get("phone") else None,
+        ]
+        for identity in filter(None, identities):
+            existing = self.by_identity.get(identity)
+            if existing:
+                return JSONResponse(status_code=400, content={
+                    "statusCode": 400,
+                    "message": "This location does not allow duplicated contacts.",
+                    "meta": {"contactId": existing, "matchingField": identity.split(":")[0]},
+                })
+        contact_id = self._next_id("ct")
+        contact = {**body, "id": contact_id}
+        self.contacts[contact_id] = contact
+        for identity in filter(None, identities):
+            self.by_identity[identity] = contact_id
+        return JSONResponse(status_code=201, content={"contact": contact})
+
+    def search_contacts(self, email: Optional[str]) -> JSONResponse:
+        contact_id = self.by_identity.get(f"email:{email.strip().lower()}") if email else None
+        contacts = [self.contacts[contact_id]] if contact_id else []
+        return JSONResponse(content={"contacts": contacts, "meta": {"total": len(contacts)}})
+
+    def create_opportunity(self, body: dict) -> JSONResponse:
+        if body.get("contactId") not in self.contacts:
+            return JSONResponse(status_code=400, content={"statusCode": 400, "message": "Contact not found"})
+        self.opportunities += 1
+        return JSONResponse(status_code=201, content={"opportunity": {**body, "id": self._next_id("op")}})
+
+    def snapshot(self) -> dict:
+        return {
+            "contacts": len(self.contacts),
+            "opportunities": self.opportunities,
+            "responses": dict(self.stats),
+        }
+
+
+def create_app(config: Optional[MockGHLConfig] = None) -> FastAPI:
+    """App FastAPI del GHL simulado; el estado queda en app.state.mock"""
+    mock = MockGHL(config or MockGHLConfig())
+    app = FastAPI(title="Mock GoHighLevel")
+    app.state.mock = mock
+
+    @app.post("/contacts/")
+    async def create_contact(request: Request):
+        body = await request.json()
+        return await mock.respond("contacts", lambda: mock.create_contact(body))
+
+    @app.get("/contacts/")
+    async def search_contacts(email: Optional[str] = None):
+        return await mock.respond("contacts_search", lambda: mock.search_contacts(email))
+
+    @app.post("/opportunities/")
+    async def create_opportunity(request: Request):
+        body = await request.json()
+        return await mock.respond("opportunities", lambda: mock.create_opportunity(body))
+
+    @app.get("/locations/{location_id}/customFields")
+    async def custom_fields(location_id: str):
+        return await mock.respond(
+            "custom_fields", lambda: JSONResponse(content={"customFields": mock.config.custom_fields})
+        )
+
+    @app.get("/__mock/stats")
+    async def stats():
+        return mock.snapshot()
+
+    @app.post("/__mock/reset")
+    async def reset():
+        mock.reset()
+        return {"status": "ok"}
+
+    return app
+
+
+class TimeoutASGITransport(httpx.ASGITransport):
+    """
+    ASGITransport que respeta el timeout de lectura de cada petición
+
+    httpx no aplica timeouts a las apps ASGI en proceso; sin esto un
+    timeout simulado colgaría la llamada en vez de lanzar ReadTimeout.
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = (request.extensions.get("timeout") or {}).get("read")
+        try:
+            return await asyncio.wait_for(super().handle_async_request(request), timeout)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout("mock GHL timeout", request=request)
+
+
+def install(config: Optional[MockGHLConfig] = None) -> MockGHL:
+    """
+    Conecta el cliente compartido de ghl_client al GHL simulado en el mismo
+    proceso (sin sockets). Devuelve el estado del mock.
+    """
+    import ghl_client
+
+    app = create_app(config)
+    ghl_client._client = httpx.AsyncClient(
+        base_url=ghl_client.GHL_API_BASE,
+        transport=TimeoutASGITransport(app=app),
+    )
+    return app.state.mock
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GoHighLevel simulado para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_GHL_PORT", "9000")))
+    parser.add_argument("--latency", default="none", help="fixed:S | uniform:A,B | lognormal:MEDIANA,SIGMA")
+    parser.add_argument("--endpoint-latency", action="append", default=[],
+                        help="endpoint=distribución, ej: opportunities=lognormal:0.3,0.6")
+    parser.add_argument("--quota", help="peticiones/intervalo_ms, ej: 100/10000")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    config = MockGHLConfig(
+        latency=args.latency,
+        endpoint_latency=dict(item.split("=", 1) for item in args.endpoint_latency),
+        quota=args.quota,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+    )
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main()
@@ -0,0 +1,112 @@
+"""
+Corpus de formularios para benchmarks y pruebas de carga
+
+Todos los generadores usan un random.Random con semilla fija, así dos
+corridas con la misma semilla envían exactamente los mismos payloads.
+
+Tipos:
+    plain      formulario simple (name, email, phone, service_type, message)
+    dmform     formulario del sitio con campos dmform-N y de carga
+    large      dmform con un all_fields grande (cientos de campos)
+    duplicate  repetición exacta de un payload anterior
+    invalid    faltan campos o email/teléfono mal formados
+"""
+import random
+from typing import Dict, List, Optional, Tuple
+
+SEED = 1234
+
+SERVICES = [
+    "express_air_freight", "trucking_services", "international_courier",
+    "cargo_consolidation", "global_ocean_freight", "car_auction",
+    "in_transit_cargo", "smart_storage", "procurement_usa", "procurement_china",
+    "charter_flights", "car_shipment_container", "general_contact", "contact_form",
+]
+
+CITIES = ["Miami, FL", "Bogotá", "Caracas", "Lima", "Santo Domingo", "Panamá", "Quito", "Madrid"]
+FIRST_NAMES = ["Ana", "Luis", "María", "José", "Carmen", "Pedro", "Lucía", "Jorge", "Sofía", "Diego"]
+LAST_NAMES = ["García", "Pérez", "Rodríguez", "Martínez", "Gómez", "Díaz", "Herrera", "Castro"]
+
+DEFAULT_MIX = {"plain": 0.45, "dmform": 0.25, "large": 0.1, "duplicate": 0.1, "invalid": 0.1}
+
+
+def _person(rng: random.Random, i: int) -> Tuple[str, str, str]:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = f"{first.lower()}.{last.lower()}{i}@example.com".encode("ascii", "ignore").decode()
+    phone = f"+1 305 {rng.randint(200, 999)} {rng.randint(1000, 9999)}"
+    return f"{first} {last}", email, phone
+
+
+def plain_form(rng: random.Random, i: int) -> dict:
+    name, email, phone = _person(rng, i)
+    return {
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "service_type": rng.choice(SERVICES),
+        "message": "Necesito cotización para un envío " * rng.randint(1, 4),
+    }
+
+
+def dmform_form(rng: random.Random, i: int) -> dict:
+    name, email, phone = _person(rng, i)
+    # El script del sitio copia dmform-0 a "name"
+    return {
+        "dmform-0": name,
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "service_type": rng.choice(SERVICES),
+        "origin_city": rng.choice(CITIES),
+        "destination_country": rng.choice(CITIES),
+        "cargo_weight": f"{rng.randint(1, 2000)} kg",
+        "dmform-3": rng.choice(["pallets", "cajas", "sobres"]),
+        "package_count": str(rng.randint(1, 40)),
+        "company_name": f"Importadora {rng.choice(LAST_NAMES)}",
+        "special_handling": rng.choice(["", "frágil", "refrigerado"]),
+        "dmform-7": "Comentario del cliente " * rng.randint(1, 3),
+    }
+
+
+def large_form(rng: random.Random, i: int, fields: int = 300) -> dict:
+    data = dmform_form(rng, i)
+    data["all_fields"] = {
+        f"dmform-{n}" if n % 3 else f"field_{n}_description": f"valor {n} " * rng.randint(1, 5)
+        for n in range(fields)
+    }
+    return data
+
+
+def invalid_form(rng: random.Random, i: int) -> dict:
+    data = plain_form(rng, i)
+    broken = rng.choice(["email", "phone", "name", "format"])
+    if broken == "format":
+        data["email"] = "sin-arroba.example.com"
+        data["phone"] = "123"
+    else:
+        data.pop(broken)
+    return data
+
+
+GENERATORS = {"plain": plain_form, "dmform": dmform_form, "large": large_form, "invalid": invalid_form}
+
+
+def build_corpus(n: int, seed: int = SEED, mix: Optional[Dict[str, float]] = None) -> List[Tuple[str, dict]]:
+    """Lista de (tipo, payload) con la proporción de tipos indicada"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = zip(*mix.items())
+    corpus: List[Tuple[str, dict]] = []
+    originals: List[dict] = []
+    for i in range(n):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "duplicate":
+            if originals:
+                corpus.append(("duplicate", dict(rng.choice(originals))))
+                continue
+            kind = "plain"
+        payload = GENERATORS[kind](rng, i)
+        if kind in ("plain", "dmform"):
+            originals.append(payload)
+        corpus.append((kind, payload))
+    return corpus
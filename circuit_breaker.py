@@ -0,0 +1,151 @@
+"""
+Circuit breaker para la API de GoHighLevel
+
+Estados:
+- closed: las llamadas pasan; se registran resultado y latencia en una
+  ventana de las últimas N llamadas.
+- open: si la tasa de errores o de llamadas lentas supera el umbral, las
+  llamadas fallan de inmediato con CircuitOpenError durante `reset_timeout`.
+- half_open: pasado ese tiempo se dejan pasar unas pocas llamadas de prueba;
+  si salen bien se cierra, si alguna falla se vuelve a abrir.
+"""
+import time
+from collections import deque
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto; la llamada no se hizo"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"circuit open, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Breaker por tasa de errores y latencia sobre una ventana deslizante
+    """
+
+    def __init__(
+        self,
+        name: str = "ghl",
+        window: int = 50,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate: float = 0.8,
+        reset_timeout: float = 30.0,
+        half_open_calls: int = 3,
+        history: int = 20,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self.state = STATE_CLOSED
+        # (fallo, lenta) de las últimas llamadas
+        self._calls: deque = deque(maxlen=window)
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.transitions: deque = deque(maxlen=history)
+
+    def _transition(self, state: str, reason: str) -> None:
+        if state == self.state:
+            return
+        self.transitions.append({
+            "at": time.time(),
+            "from": self.state,
+            "to": state,
+            "reason": reason,
+        })
+        self.state = state
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+        self._calls.clear()
+        self._failures = self._slow = 0
+        self._probes_in_flight = self._probe_successes = 0
+
+    def retry_in(self) -> float:
+        """Segundos que faltan para permitir llamadas de prueba"""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self) -> None:
+        """Falla rápido si el circuito está abierto, sin reservar una llamada de prueba"""
+        if self.state == STATE_OPEN and self.retry_in() > 0:
+            raise CircuitOpenError(self.retry_in())
+
+    def before_call(self) -> None:
+        """Lanza CircuitOpenError si la llamada no debe hacerse"""
+        if self.state == STATE_OPEN:
+            remaining = self.retry_in()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self._transition(STATE_HALF_OPEN, "reset timeout elapsed")
+
+        if self.state == STATE_HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_calls:
+                raise CircuitOpenError(self.reset_timeout)
+            self._probes_in_flight += 1
+
+    def cancel_call(self) -> None:
+        """La llamada permitida se abortó sin resultado (ej: cancelación)"""
+        if self.state == STATE_HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, failed: bool, latency: float) -> None:
+        """Registra el resultado de una llamada permitida por before_call"""
+        slow = latency >= self.slow_call_seconds
+
+        if self.state == STATE_HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed or slow:
+                self._transition(STATE_OPEN, "probe failed" if failed else "probe slow")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(STATE_CLOSED, "probes succeeded")
+            return
+
+        if self.state != STATE_CLOSED:
+            return
+
+        if len(self._calls) == self._calls.maxlen:
+            old_failed, old_slow = self._calls[0]
+            self._failures -= old_failed
+            self._slow -= old_slow
+        self._calls.append((failed, slow))
+        self._failures += failed
+        self._slow += slow
+
+        total = len(self._calls)
+        if total < self.min_calls:
+            return
+        if self._failures / total >= self.failure_rate:
+            self._transition(STATE_OPEN, f"failure rate {self._failures}/{total}")
+        elif self._slow / total >= self.slow_call_rate:
+            self._transition(STATE_OPEN, f"slow call rate {self._slow}/{total}")
+
+    def snapshot(self) -> dict:
+        total = len(self._calls)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "retry_in": round(self.retry_in(), 3),
+            "window_calls": total,
+            "failure_rate": round(self._failures / total, 3) if total else 0.0,
+            "slow_call_rate": round(self._slow / total, 3) if total else 0.0,
+            "transitions": list(self.transitions),
+        }
@@ -0,0 +1,111 @@
+"""
+Índice local de identidad de contactos (email / teléfono → contactId de GHL)
+
+Para clientes que vuelven, evita el ciclo POST /contacts/ → 400 duplicate →
+GET /contacts/ y permite ir directo a crear la oportunidad. Se llena con los
+contactos creados y con los duplicados que reporta GHL; si GHL indica que un
+contactId ya no existe, se invalida.
+"""
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contact_identities (
+    identity TEXT PRIMARY KEY,
+    contact_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contact_identities_contact
+    ON contact_identities (contact_id);
+"""
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+    """Solo dígitos; los números de 10 dígitos se asumen de EE.UU. (+1)"""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 10:
+        digits = "1" + digits
+    return digits
+
+
+def contact_identities(email: str = "", phone: str = "") -> list:
+    """Claves de identidad en orden de prioridad (email primero)"""
+    identities = []
+    email = normalize_email(email)
+    if email:
+        identities.append(f"email:{email}")
+    phone = normalize_phone(phone)
+    if len(phone) >= 10:
+        identities.append(f"phone:{phone}")
+    return identities
+
+
+class ContactIndex:
+    """
+    Mapa persistente (SQLite) de identidades normalizadas a contactId
+
+    Operaciones síncronas y cortas; desde código async usar asyncio.to_thread.
+    """
+
+    def __init__(self, path: str = "contacts.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, email: str = "", phone: str = "") -> Optional[str]:
+        """
+        Devuelve el contactId conocido para el email o, solo si no hay email,
+        para el teléfono; None si no se conoce
+
+        Un teléfono puede ser compartido (oficina, familia): con un email
+        distinto es otra persona, así que un acierto por teléfono no se usa
+        cuando el envío trae email.
+        """
+        identities = contact_identities(email, phone)
+        if not identities:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT contact_id FROM contact_identities WHERE identity = ?", (identities[0],)
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember(self, contact_id: str, email: str = "", phone: str = "") -> None:
+        """Asocia el email y el teléfono normalizados al contactId"""
+        identities = contact_identities(email, phone)
+        if not contact_id or not identities:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO contact_identities (identity, contact_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(identity) DO UPDATE SET contact_id = excluded.contact_id, "
+                "updated_at = excluded.updated_at",
+                [(identity, contact_id, now) for identity in identities],
+            )
+
+    def invalidate(self, contact_id: str) -> int:
+        """Elimina todas las identidades que apuntan a un contactId que ya no existe"""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM contact_identities WHERE contact_id = ?", (contact_id,)
+            )
+            return cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contact_identities").fetchone()[0]
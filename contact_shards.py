@@ -0,0 +1,67 @@
+"""
+Orden de la entrega por contacto
+
+Dos envíos de la misma persona no deben entregarse a la vez: ambos podrían
+no ver el duplicado y crear dos contactos, o crear las oportunidades en
+otro orden. La clave de contacto es un hash de su identidad normalizada
+(email y, si no hay, teléfono; ver contact_index.contact_identities):
+
+- la cola guarda la clave de cada envío y no entrega uno mientras haya
+  otro anterior del mismo contacto sin terminar, así que un contacto se
+  procesa en orden mientras los demás avanzan en paralelo en cualquier
+  worker libre (también entre procesos);
+- sin cola (webhook_server), ContactLocks serializa las peticiones
+  concurrentes del mismo contacto dentro del proceso.
+"""
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from contact_index import contact_identities
+
+
+def contact_key(email: str = "", phone: str = "") -> Optional[str]:
+    """Clave estable del contacto (None si no hay email ni teléfono válido)"""
+    identities = contact_identities(email, phone)
+    if not identities:
+        return None
+    return hashlib.blake2b(identities[0].encode(), digest_size=8).hexdigest()
+
+
+def submission_contact_key(data: dict) -> Optional[str]:
+    return contact_key(str(data.get("email") or ""), str(data.get("phone") or ""))
+
+
+class ContactLocks:
+    """
+    Un lock por clave de contacto, creado al usarse y descartado cuando
+    nadie lo espera (la memoria no crece con los contactos vistos). Los
+    locks de asyncio son FIFO: las peticiones de un contacto pasan en el
+    orden en que llegaron.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Optional[str]):
+        if key is None:
+            yield
+            return
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,155 @@
+"""
+Catálogo en memoria de custom fields de GoHighLevel
+
+Descarga /locations/{id}/customFields una sola vez y lo indexa por nombre
+normalizado y por key. Se refresca en segundo plano cada TTL, solo una
+descarga puede estar en curso a la vez (las demás peticiones la esperan) y,
+si GHL falla, se sigue sirviendo la última copia buena.
+
+Si la descarga falla no se reintenta hasta pasados `failure_backoff`
+segundos: mientras tanto get_id responde con lo que haya (None si nunca se
+cargó) en vez de lanzar una descarga por cada búsqueda. CircuitOpenError no
+cuenta como fallo: se propaga al llamador para que el breaker corte.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from circuit_breaker import CircuitOpenError
+from ghl_client import ghl_request
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_field_name(name: str) -> str:
+    """Normaliza un nombre o key de custom field (case insensitive)"""
+    return (name or "").strip().lower()
+
+
+class CustomFieldCatalog:
+    """
+    Índice de custom fields con TTL, refresco en background y single-flight
+    """
+
+    def __init__(self, location_id: str, ttl: float = 300.0, model: str = "contact",
+                 failure_backoff: float = 30.0):
+        self.location_id = location_id
+        self.ttl = ttl
+        self.model = model
+        self.failure_backoff = failure_backoff
+        self._by_name: Dict[str, str] = {}
+        self._by_key: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    @property
+    def in_backoff(self) -> bool:
+        """La última descarga falló hace menos de failure_backoff"""
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.failure_backoff
+
+    async def _fetch(self) -> None:
+        resp = await ghl_request(
+            "GET",
+            f"/locations/{self.location_id}/customFields",
+            endpoint="custom_fields",
+            params={"model": self.model}
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(f"{resp.status_code} - {resp.text}")
+
+        data = resp.json()
+        fields = data.get("customFields", []) or data.get("custom_fields", [])
+
+        by_name: Dict[str, str] = {}
+        by_key: Dict[str, str] = {}
+        for f in fields:
+            field_id = f.get("id")
+            if not field_id:
+                continue
+            name = normalize_field_name(f.get("name"))
+            if name:
+                by_name.setdefault(name, field_id)
+            key = normalize_field_name(f.get("fieldKey") or f.get("key"))
+            if key:
+                by_key.setdefault(key, field_id)
+                # "contact.service_type" también se indexa como "service_type"
+                by_key.setdefault(key.split(".", 1)[-1], field_id)
+
+        self._by_name = by_name
+        self._by_key = by_key
+        self._loaded_at = time.monotonic()
+        self._failed_at = None
+        logger.info(f"✅ Catálogo de custom fields cargado: {len(by_name)} campos")
+
+    async def _load(self) -> None:
+        try:
+            await self._fetch()
+        except CircuitOpenError:
+            if not self.is_loaded:
+                raise
+            logger.warning("⚠️ Circuito de GHL abierto, se usa la copia anterior de custom fields")
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            if self.is_loaded:
+                logger.warning(f"⚠️ Error refrescando custom fields, se usa la copia anterior: {e}")
+            else:
+                logger.error(f"❌ Error obteniendo custom fields GHL: {e}")
+
+    def refresh(self) -> asyncio.Task:
+        """Lanza una recarga o devuelve la que ya está en curso (single-flight)"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._load())
+        return self._inflight
+
+    async def ensure_loaded(self) -> None:
+        """
+        Espera la carga inicial; si el catálogo está vencido se sirve la
+        copia actual y se refresca en segundo plano. Tras un fallo no se
+        vuelve a descargar hasta que pase failure_backoff.
+        """
+        if self.in_backoff:
+            return
+        if not self.is_loaded:
+            await asyncio.shield(self.refresh())
+        elif self.is_stale:
+            self.refresh()
+
+    async def get_id(self, field_name: str) -> Optional[str]:
+        """Devuelve el ID del custom field por nombre o key, o None"""
+        await self.ensure_loaded()
+        normalized = normalize_field_name(field_name)
+        return self._by_name.get(normalized) or self._by_key.get(normalized)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except CircuitOpenError as e:
+                logger.warning(f"⚠️ Custom fields sin cargar, circuito de GHL abierto: {e}")
+            await asyncio.sleep(self.ttl)
+
+    def start(self) -> None:
+        """Inicia el refresco periódico en segundo plano"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Detiene el refresco periódico"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
@@ -0,0 +1,203 @@
+"""
+Pool de workers que entrega los envíos encolados a GoHighLevel
+
+Un dispatcher toma envíos de la SubmissionQueue (con lease) y los reparte
+entre N workers async. Cada envío avanza paso a paso y cada paso se
+persiste antes del siguiente, de modo que un fallo en la oportunidad no
+vuelve a crear el contacto:
+
+    pending → contact_created → opportunity_created → done
+
+Con un LaneScheduler el dispatcher solo toma tantos envíos como workers
+libres haya y deja que el scheduler decida cuáles (carriles de prioridad,
+ver priority_lanes.py): lo que llega urgente mientras los workers están
+ocupados no queda detrás de un lote ya reservado.
+
+Los envíos de una misma persona se entregan en orden y nunca a la vez: la
+cola no entrega uno mientras haya otro anterior del mismo contacto sin
+terminar (ver contact_shards.py). Los de contactos distintos los toma
+cualquier worker libre, en paralelo.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from circuit_breaker import CircuitOpenError
+from priority_lanes import LaneScheduler
+from request_trace import trace_context
+from submission_queue import (
+    SubmissionQueue,
+    STATUS_PENDING,
+    STATUS_CONTACT_CREATED,
+    STATUS_OPPORTUNITY_CREATED,
+    STATUS_DONE,
+    STATUS_FAILED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Paso de contacto: recibe los datos del formulario y devuelve el contactId
+ContactStep = Callable[[dict], Awaitable[Optional[str]]]
+# Paso de oportunidad: recibe contactId y datos, devuelve la respuesta de GHL
+OpportunityStep = Callable[[str, dict], Awaitable[Optional[dict]]]
+
+
+class DeliveryError(Exception):
+    """Un paso de la entrega no se completó; el envío se reintenta"""
+
+
+class StaleContactError(DeliveryError):
+    """GHL reporta que el contactId ya no existe; se vuelve al paso de contacto"""
+
+
+class DeliveryWorkerPool:
+    """
+    Drena la cola de envíos con un número configurable de workers
+    """
+
+    def __init__(
+        self,
+        queue: SubmissionQueue,
+        contact_step: ContactStep,
+        opportunity_step: OpportunityStep,
+        workers: int = 4,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 300.0,
+        scheduler: Optional[LaneScheduler] = None,
+    ):
+        self.queue = queue
+        self.contact_step = contact_step
+        self.opportunity_step = opportunity_step
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.scheduler = scheduler
+        self._work: Optional[asyncio.Queue] = None
+        self._wakeup = asyncio.Event()
+        self._tasks: list = []
+        # Envíos entregados al canal de workers y aún no terminados
+        self._inflight = 0
+
+    def notify(self) -> None:
+        """Avisa al dispatcher de que hay envíos nuevos"""
+        self._wakeup.set()
+
+    async def process(self, item: dict) -> None:
+        """Avanza un envío desde su último paso completado hasta 'done'"""
+        submission_id = item["id"]
+        data = item["data"]
+        status = item["status"]
+        contact_id = item.get("contact_id")
+
+        if status == STATUS_PENDING:
+            contact_id = await self.contact_step(data)
+            if not contact_id:
+                raise DeliveryError("contact step failed")
+            await asyncio.to_thread(
+                self.queue.advance, submission_id, STATUS_CONTACT_CREATED, contact_id=contact_id
+            )
+            status = STATUS_CONTACT_CREATED
+
+        if status == STATUS_CONTACT_CREATED:
+            try:
+                opportunity = await self.opportunity_step(contact_id, data)
+            except StaleContactError:
+                await asyncio.to_thread(self.queue.rewind, submission_id)
+                raise
+            if not opportunity:
+                raise DeliveryError("opportunity step failed")
+            opportunity_id = (opportunity.get("opportunity") or {}).get("id")
+            await asyncio.to_thread(
+                self.queue.advance,
+                submission_id,
+                STATUS_OPPORTUNITY_CREATED,
+                opportunity_id=opportunity_id,
+            )
+            status = STATUS_OPPORTUNITY_CREATED
+
+        if status == STATUS_OPPORTUNITY_CREATED:
+            await asyncio.to_thread(
+                self.queue.advance, submission_id, STATUS_DONE, result={"contact_id": contact_id}
+            )
+
+    async def _handle(self, item: dict) -> None:
+        submission_id = item["id"]
+        try:
+            with trace_context("delivery", submission_id=submission_id, from_status=item["status"]):
+                await self.process(item)
+            logger.info(f"✅ Envío {submission_id} entregado a GHL")
+        except CircuitOpenError as e:
+            # GHL no disponible: se pospone sin gastar un intento
+            await asyncio.to_thread(
+                self.queue.defer, submission_id, max(e.retry_in, self.poll_interval), str(e)
+            )
+            logger.info(f"⏸️ Envío {submission_id} pospuesto: {e}")
+        except Exception as e:
+            status = await asyncio.to_thread(self.queue.mark_retry, submission_id, str(e))
+            if status == STATUS_FAILED:
+                logger.error(f"❌ Envío {submission_id} descartado tras agotar los reintentos: {e}")
+            else:
+                logger.warning(f"⚠️ Envío {submission_id} reprogramado ({status}): {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._work.get()
+            try:
+                await self._handle(item)
+            finally:
+                self._inflight -= 1
+                self._work.task_done()
+                # Un worker libre: el dispatcher puede tomar el siguiente
+                self._wakeup.set()
+
+    async def _claim(self, limit: int) -> list:
+        if self.scheduler is None:
+            return await asyncio.to_thread(self.queue.claim, limit, self.lease_seconds)
+        items = await asyncio.to_thread(self.queue.claim_lanes, limit, self.lease_seconds, self.scheduler)
+        self.scheduler.observe(items, time.time())
+        return items
+
+    async def _dispatcher(self) -> None:
+        while True:
+            # Antes de buscar trabajo: un aviso que llegue mientras tanto no se pierde
+            self._wakeup.clear()
+            claimed = 0
+            free = self.workers - self._inflight
+            if free > 0:
+                try:
+                    items = await self._claim(free)
+                    for item in items:
+                        # Nunca bloquea: se toman como mucho tantos como workers libres
+                        self._inflight += 1
+                        self._work.put_nowait(item)
+                    claimed = len(items)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Error en el dispatcher de entregas: {str(e)}")
+
+            if claimed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Arranca el dispatcher y los workers"""
+        if self._tasks:
+            return
+        self._work = asyncio.Queue(maxsize=self.workers)
+        self._inflight = 0
+        self._tasks = [asyncio.create_task(self._dispatcher())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"🚚 Pool de entrega iniciado con {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Detiene el pool; los envíos en curso se retoman al vencer su lease"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,115 @@
+"""
+Etiquetas legibles para los campos del formulario (tags de GoHighLevel)
+
+El matcher se compila una sola vez al importar: una única expresión regular
+con todas las claves de FIELD_LABELS localiza las que aparecen dentro del
+nombre del campo (normalmente ninguna o una) y se elige la de mayor
+prioridad (orden del diccionario), igual que el recorrido original. Por
+sí solo el matcher apenas gana al recorrido original; la mejora viene de
+memorizar los resultados en un LRU acotado, porque los formularios repiten
+siempre los mismos nombres de campo.
+
+Los nombres de campo los elige quien envía el formulario: solo se
+memorizan los de hasta LABEL_CACHE_MAX_KEY_LEN caracteres, así el LRU no
+puede retener claves enormes (los nombres reales son cortos).
+"""
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Mapeo de nombres de campos a etiquetas legibles (el orden define la prioridad)
+FIELD_LABELS = {
+    "destination": "Destino",
+    "origin": "Origen",
+    "weight": "Peso",
+    "kilo": "Kilos",
+    "lb": "Lbs",
+    "cargo": "Carga",
+    "package": "PCS",
+    "pallet": "Pallets",
+    "pcs": "PCS",
+    "pieces": "PCS",
+    "company": "Empresa",
+    "shipping": "Envío",
+    "description": "Descripción",
+    "goods": "Mercancía",
+    "handling": "Handling",
+    "special": "Especial",
+    "hub": "Hub",
+    "consolidation": "Consolidación"
+}
+
+LABEL_CACHE_SIZE = 4096
+LABEL_CACHE_MAX_KEY_LEN = 64
+
+_LABEL_PRIORITY = {field_key: i for i, field_key in enumerate(FIELD_LABELS)}
+_LABEL_VALUES = list(FIELD_LABELS.values())
+
+# Ninguna clave es prefijo de otra, así que en cada posición coincide a lo
+# sumo una; buscando de nuevo desde start + 1 se obtienen también las
+# coincidencias solapadas.
+_LABEL_SEARCH = re.compile(
+    "|".join(re.escape(field_key) for field_key in FIELD_LABELS)
+).search
+
+
+def _label_for_key(key: str) -> str:
+    """
+    Etiqueta legible para un nombre de campo
+
+    Devuelve la etiqueta de la primera clave de FIELD_LABELS (en orden) que
+    aparece dentro del nombre; si ninguna aparece, el nombre limpio.
+    """
+    lowered = key.lower()
+    best = None
+    match = _LABEL_SEARCH(lowered)
+    while match is not None:
+        priority = _LABEL_PRIORITY[match.group()]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+        match = _LABEL_SEARCH(lowered, match.start() + 1)
+    if best is not None:
+        return _LABEL_VALUES[best]
+    return key.replace("_", " ").replace("-", " ").replace("dmform", "Campo").title()
+
+
+def _key_traits(key: str) -> Tuple[bool, bool, bool, bool]:
+    """
+    Clasificación de un nombre de campo para extract_form_data
+
+    Returns:
+        (es_destino, contiene_origin, contiene_shipping, es_peso)
+    """
+    lowered = key.lower()
+    return (
+        "destination" in lowered or "destino" in lowered,
+        "origin" in lowered,
+        "shipping" in lowered,
+        "cargo" in lowered or "weight" in lowered or "package" in lowered or "pallet" in lowered,
+    )
+
+
+_cached_label = lru_cache(maxsize=LABEL_CACHE_SIZE)(_label_for_key)
+_cached_traits = lru_cache(maxsize=LABEL_CACHE_SIZE)(_key_traits)
+
+
+def label_for_key(key: str) -> str:
+    """Etiqueta legible para un nombre de campo (ver _label_for_key)"""
+    if len(key) > LABEL_CACHE_MAX_KEY_LEN:
+        return _label_for_key(key)
+    return _cached_label(key)
+
+
+def key_traits(key: str) -> Tuple[bool, bool, bool, bool]:
+    """Clasificación de un nombre de campo (ver _key_traits)"""
+    if len(key) > LABEL_CACHE_MAX_KEY_LEN:
+        return _key_traits(key)
+    return _cached_traits(key)
+
+
+def clear_caches() -> None:
+    """Vacía los LRU de etiquetas y clasificaciones (benchmarks, tests)"""
+    _cached_label.cache_clear()
+    _cached_traits.cache_clear()
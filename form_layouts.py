@@ -0,0 +1,99 @@
+"""
+Planes de extracción por layout de formulario (payloads dmform)
+
+El sitio tiene un conjunto pequeño y fijo de formularios. Cada payload se
+identifica por la secuencia de sus nombres de campo (incluidos los de
+all_fields) y, la primera vez que aparece un layout, se compila un plan:
+qué campo es el nombre, cuáles son origen / destino / peso y qué campos se
+convierten en tags con qué etiqueta. Los planes se guardan en un LRU
+acotado, así que los layouts repetidos no recorren ni comparan nombres de
+campo: solo leen valores. Solo se memorizan layouts cuyos nombres suman
+hasta PLAN_CACHE_MAX_LAYOUT_CHARS caracteres: la huella la elige quien
+envía, y el LRU no debe retener payloads enormes.
+
+La huella usa el orden de los campos y no el conjunto ordenado porque el
+resultado depende del orden (primer dmform-0*, primer campo de peso, orden
+de los tags).
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+from field_labels import label_for_key, key_traits
+
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_MAX_LAYOUT_CHARS = 4096
+
+# Campos que nunca se convierten en tags
+TAG_EXCLUDED_FIELDS = frozenset({"email", "name", "phone", "service_type"})
+
+# Clases de campo para extract_form_data
+KIND_DESTINATION = 0
+KIND_ORIGIN = 1
+# "shipping" sin "origin" en el nombre: es origen solo si el valor lo menciona;
+# si no, puede contar como peso
+KIND_SHIPPING = 2
+KIND_WEIGHT = 3
+
+
+class ExtractionPlan(NamedTuple):
+    # Primer campo dmform-0* (nombre cuando no viene "name")
+    name_key: Optional[str]
+    # (campo, etiqueta) candidatos a tag, en orden
+    tag_fields: Tuple[Tuple[str, str], ...]
+    # (campo, clase, cuenta_como_peso) relevantes para origen/destino/peso
+    location_fields: Tuple[Tuple[str, int, bool], ...]
+
+
+def layout_fingerprint(data: dict) -> Tuple[tuple, Optional[tuple]]:
+    """Huella del layout: nombres de campo y, si existe, los de all_fields"""
+    all_fields = data.get("all_fields")
+    return tuple(data), tuple(all_fields) if isinstance(all_fields, dict) else None
+
+
+def compile_plan(keys: tuple, all_fields_keys: Optional[tuple]) -> ExtractionPlan:
+    """Compila el plan de extracción de un layout"""
+    name_key = next((key for key in keys if key.startswith("dmform-0")), None)
+
+    # Mismo orden que data_to_process en create_ghl_contact: all_fields se
+    # expande y sus claves nuevas van al final
+    if all_fields_keys is not None:
+        tag_keys = [key for key in keys if key != "all_fields"]
+        seen = set(tag_keys)
+        tag_keys += [key for key in all_fields_keys if key not in seen]
+    else:
+        tag_keys = list(keys)
+    tag_fields = tuple(
+        (key, label_for_key(key)) for key in tag_keys if key not in TAG_EXCLUDED_FIELDS
+    )
+
+    location_fields = []
+    for key in keys:
+        is_destination, has_origin, has_shipping, is_weight = key_traits(key)
+        if is_destination:
+            location_fields.append((key, KIND_DESTINATION, False))
+        elif has_origin:
+            location_fields.append((key, KIND_ORIGIN, False))
+        elif has_shipping:
+            location_fields.append((key, KIND_SHIPPING, is_weight))
+        elif is_weight:
+            location_fields.append((key, KIND_WEIGHT, True))
+
+    return ExtractionPlan(name_key, tag_fields, tuple(location_fields))
+
+
+_cached_plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(compile_plan)
+
+
+def _layout_chars(keys: tuple, all_fields_keys: Optional[tuple]) -> int:
+    total = sum(len(key) for key in keys)
+    if all_fields_keys is not None:
+        total += sum(len(key) for key in all_fields_keys)
+    return total
+
+
+def plan_for(data: dict) -> ExtractionPlan:
+    """Plan del layout del payload (desde el LRU si ya se vio)"""
+    keys, all_fields_keys = layout_fingerprint(data)
+    if _layout_chars(keys, all_fields_keys) > PLAN_CACHE_MAX_LAYOUT_CHARS:
+        return compile_plan(keys, all_fields_keys)
+    return _cached_plan(keys, all_fields_keys)
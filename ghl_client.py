@@ -0,0 +1,264 @@
+"""
+Cliente asíncrono compartido para la API de GoHighLevel
+
+Un único httpx.AsyncClient por proceso con pool de conexiones, keep-alive
+y HTTP/2 (si el paquete h2 está instalado). Cada endpoint de GHL tiene su
+propio timeout para que una llamada lenta no retenga el event loop.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+import httpx
+
+from ghl_retry import RetryBudget, RetryPolicy, RetryStats, is_retryable
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from rate_governor import RateGovernor, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+import metrics
+from request_trace import span
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURACIÓN
+# ============================================
+
+GHL_API_BASE = os.getenv("GOHIGHLEVEL_API_BASE", "https://services.leadconnectorhq.com")
+GHL_API_VERSION = "2021-07-28"
+
+# Tamaño del pool de conexiones compartido
+GHL_MAX_CONNECTIONS = int(os.getenv("GHL_MAX_CONNECTIONS", "100"))
+GHL_MAX_KEEPALIVE = int(os.getenv("GHL_MAX_KEEPALIVE", "20"))
+GHL_KEEPALIVE_EXPIRY = float(os.getenv("GHL_KEEPALIVE_EXPIRY", "30"))
+
+# Límite global de llamadas a GHL en vuelo (todas las tareas del proceso)
+GHL_MAX_INFLIGHT = int(os.getenv("GHL_MAX_INFLIGHT", "20"))
+
+# Reintentos: intentos por llamada y fracción del tráfico que pueden ser reintentos
+GHL_RETRY_MAX_ATTEMPTS = int(os.getenv("GHL_RETRY_MAX_ATTEMPTS", "4"))
+GHL_RETRY_BUDGET_RATIO = float(os.getenv("GHL_RETRY_BUDGET_RATIO", "0.2"))
+
+# Circuit breaker: abre con esta tasa de errores o de llamadas lentas
+GHL_BREAKER_FAILURE_RATE = float(os.getenv("GHL_BREAKER_FAILURE_RATE", "0.5"))
+GHL_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("GHL_BREAKER_SLOW_CALL_SECONDS", "10"))
+GHL_BREAKER_RESET_TIMEOUT = float(os.getenv("GHL_BREAKER_RESET_TIMEOUT", "30"))
+
+# Gobernador de tasa compartido entre workers (archivo SQLite)
+GHL_GOVERNOR_PATH = os.getenv("GHL_GOVERNOR_PATH", "ghl_governor.db")
+GHL_RATE_PER_SECOND = float(os.getenv("GHL_RATE_PER_SECOND", "8"))
+GHL_RATE_BURST = float(os.getenv("GHL_RATE_BURST", "20"))
+
+# Prioridad por endpoint: completar un lead en curso va primero
+ENDPOINT_PRIORITY = {
+    "opportunities": PRIORITY_HIGH,
+    "contacts_search": PRIORITY_HIGH,
+    "contacts": PRIORITY_NORMAL,
+    "custom_fields": PRIORITY_LOW,
+}
+
+# Timeouts por endpoint (segundos): (connect, read)
+ENDPOINT_TIMEOUTS = {
+    "contacts": (5.0, 15.0),
+    "contacts_search": (5.0, 10.0),
+    "opportunities": (5.0, 15.0),
+    "custom_fields": (5.0, 10.0),
+}
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# Nombre de la etapa en Server-Timing / trazas lentas
+ENDPOINT_STAGES = {
+    "contacts": "contact_create",
+    "contacts_search": "duplicate_search",
+    "opportunities": "opportunity_create",
+    "custom_fields": "custom_fields_fetch",
+}
+
+_client: Optional[httpx.AsyncClient] = None
+_inflight: Optional[asyncio.Semaphore] = None
+
+retry_policy = RetryPolicy(max_attempts=GHL_RETRY_MAX_ATTEMPTS)
+retry_budget = RetryBudget(ratio=GHL_RETRY_BUDGET_RATIO)
+retry_stats = RetryStats()
+governor = RateGovernor(GHL_GOVERNOR_PATH, rate=GHL_RATE_PER_SECOND, capacity=GHL_RATE_BURST)
+breaker = CircuitBreaker(
+    "ghl",
+    failure_rate=GHL_BREAKER_FAILURE_RATE,
+    slow_call_seconds=GHL_BREAKER_SLOW_CALL_SECONDS,
+    reset_timeout=GHL_BREAKER_RESET_TIMEOUT,
+)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 requiere el paquete opcional h2"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _endpoint_timeout(endpoint: str) -> httpx.Timeout:
+    connect, read = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    return httpx.Timeout(read, connect=connect)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Devuelve el cliente compartido, creándolo la primera vez"""
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = _http2_available()
+        _client = httpx.AsyncClient(
+            base_url=GHL_API_BASE,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=GHL_MAX_CONNECTIONS,
+                max_keepalive_connections=GHL_MAX_KEEPALIVE,
+                keepalive_expiry=GHL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0]),
+        )
+        logger.info(f"🔌 Cliente GHL inicializado (http2={http2}, pool={GHL_MAX_CONNECTIONS})")
+    return _client
+
+
+def _inflight_limit() -> asyncio.Semaphore:
+    global _inflight
+    if _inflight is None:
+        _inflight = asyncio.Semaphore(GHL_MAX_INFLIGHT)
+    return _inflight
+
+
+async def close_client() -> None:
+    """Cierra el cliente compartido (llamar en el shutdown de la app)"""
+    global _client, _inflight
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _inflight = None
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {os.getenv('GOHIGHLEVEL_API_KEY')}",
+        "Version": GHL_API_VERSION,
+        "Accept": "application/json",
+    }
+
+
+async def ghl_request(
+    method: str,
+    path: str,
+    *,
+    endpoint: str,
+    params: Optional[dict] = None,
+    json: Optional[dict] = None,
+    priority: Optional[str] = None,
+) -> httpx.Response:
+    """
+    Ejecuta una petición contra GHL usando el pool compartido
+
+    Los fallos transitorios (429, 5xx, errores de conexión) se reintentan
+    con backoff y jitter mientras quede presupuesto global de reintentos.
+    Con el circuit breaker abierto falla de inmediato con CircuitOpenError.
+    Cada intento espera un token del gobernador de tasa compartido.
+
+    Args:
+        method: Método HTTP
+        path: Ruta relativa a GHL_API_BASE (ej: "/contacts/")
+        endpoint: Nombre lógico del endpoint (contacts, contacts_search,
+            opportunities, custom_fields) usado para elegir el timeout
+        params: Query string
+        json: Cuerpo JSON
+        priority: Prioridad ante el gobernador (por defecto según endpoint)
+
+    Returns:
+        La respuesta httpx (no lanza por códigos de estado; lanza el error
+        de transporte si se agotan los reintentos, o CircuitOpenError)
+    """
+    with span(ENDPOINT_STAGES.get(endpoint, endpoint)):
+        return await _ghl_request(method, path, endpoint, params, json, priority)
+
+
+async def _ghl_request(
+    method: str,
+    path: str,
+    endpoint: str,
+    params: Optional[dict],
+    json: Optional[dict],
+    priority: Optional[str],
+) -> httpx.Response:
+    client = get_client()
+    priority = priority or ENDPOINT_PRIORITY.get(endpoint, PRIORITY_NORMAL)
+    retry_budget.record_request()
+    retry_stats.record(endpoint, "requests")
+
+    attempt = 1
+    retry_started: Optional[float] = None
+    while True:
+        response: Optional[httpx.Response] = None
+        error: Optional[Exception] = None
+        try:
+            breaker.check()
+        except CircuitOpenError:
+            metrics.ghl_requests.inc(endpoint, "circuit_open")
+            raise
+        await governor.acquire(priority)
+        async with _inflight_limit():
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                metrics.ghl_requests.inc(endpoint, "circuit_open")
+                raise
+            started = time.monotonic()
+            try:
+                response = await client.request(
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    headers=_headers(),
+                    timeout=_endpoint_timeout(endpoint),
+                )
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                breaker.cancel_call()
+                raise
+            latency = time.monotonic() - started
+            breaker.record(
+                failed=error is not None or response.status_code >= 500,
+                latency=latency,
+            )
+        metrics.ghl_request_duration.observe(latency, endpoint)
+        metrics.ghl_requests.inc(endpoint, str(response.status_code) if response is not None else "error")
+        if response is not None:
+            await asyncio.to_thread(governor.observe, response)
+
+        if not is_retryable(method, response, error):
+            break
+        if attempt >= retry_policy.max_attempts:
+            retry_stats.record(endpoint, "gave_up")
+            break
+        delay = retry_policy.delay(attempt, response)
+        if delay is None:
+            retry_stats.record(endpoint, "gave_up")
+            break
+        if not retry_budget.try_acquire():
+            retry_stats.record(endpoint, "budget_exhausted")
+            break
+
+        reason = response.status_code if response is not None else type(error).__name__
+        logger.warning(f"🔁 GHL {endpoint} falló ({reason}), reintento {attempt} en {delay:.2f}s")
+        retry_stats.record(endpoint, "retries")
+        if retry_started is None:
+            retry_started = time.monotonic()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+    if retry_started is not None:
+        retry_stats.record(endpoint, "retry_seconds", time.monotonic() - retry_started)
+    if error is not None:
+        raise error
+    return response
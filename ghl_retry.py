@@ -0,0 +1,148 @@
+"""
+Reintentos para las llamadas a GoHighLevel
+
+Clasifica cada resultado como reintentable o permanente, respeta Retry-After,
+espera con backoff exponencial con jitter y descuenta de un presupuesto
+global de reintentos para que durante un incidente los reintentos no
+multipliquen la carga sobre GHL. Lleva estadísticas por endpoint.
+"""
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+# Códigos que GHL devuelve ante sobrecarga o fallos transitorios
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# Para POST solo se reintenta si es seguro que GHL no procesó la petición:
+# 429 (rechazada por cuota) y 503 con Retry-After (rechazada por GHL, no por
+# un gateway intermedio). Un 502/504 de gateway no lo garantiza: GHL pudo
+# haber creado el contacto u oportunidad y reintentar lo duplicaría.
+RETRYABLE_STATUS_UNSAFE = frozenset({429})
+
+
+def is_retryable(method: str, response: Optional[httpx.Response] = None,
+                 error: Optional[Exception] = None) -> bool:
+    """
+    Clasifica un resultado de GHL como reintentable (True) o permanente (False)
+    """
+    idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    if error is not None:
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            # La petición no llegó a enviarse
+            return True
+        return idempotent and isinstance(error, httpx.TransportError)
+    if response is None:
+        return False
+    if idempotent:
+        return response.status_code in RETRYABLE_STATUS
+    if response.status_code == 503:
+        return "Retry-After" in response.headers
+    return response.status_code in RETRYABLE_STATUS_UNSAFE
+
+
+def parse_retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Segundos indicados en Retry-After (número o fecha HTTP), o None"""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Presupuesto global de reintentos (token bucket)
+
+    Cada petición original deposita `ratio` tokens y cada reintento consume
+    uno; `min_per_second` garantiza unos pocos reintentos con poco tráfico.
+    Así los reintentos quedan acotados a ~ratio del tráfico total.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class RetryPolicy:
+    """Backoff exponencial con jitter completo, acotado por `max_delay`"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 10.0, max_retry_after: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+        """
+        Espera antes del reintento número `attempt` (1 = primer reintento);
+        None si Retry-After pide esperar más de lo razonable
+        """
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class RetryStats:
+    """Contadores de reintentos por endpoint"""
+
+    def __init__(self):
+        self._stats: dict = {}
+
+    def _endpoint(self, endpoint: str) -> dict:
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = {
+                "requests": 0,
+                "retries": 0,
+                "retry_seconds": 0.0,
+                "gave_up": 0,
+                "budget_exhausted": 0,
+            }
+        return stats
+
+    def record(self, endpoint: str, field: str, amount: float = 1) -> None:
+        self._endpoint(endpoint)[field] += amount
+
+    def snapshot(self) -> dict:
+        return {
+            endpoint: dict(stats, retry_seconds=round(stats["retry_seconds"], 3))
+            for endpoint, stats in self._stats.items()
+        }
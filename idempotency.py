@@ -0,0 +1,116 @@
+"""
+Deduplicación de reenvíos con claves de idempotencia
+
+Si la petición trae cabecera Idempotency-Key se usa esa clave; si no, se
+deriva de un hash canónico del payload normalizado (sin campos volátiles como
+timestamp o user_agent). Los repetidos dentro de la ventana reciben la
+respuesta original sin volver a encolar ni llamar a GHL. Las peticiones
+concurrentes con la misma clave esperan a la primera.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+# Campos que cambian en cada envío del mismo formulario
+VOLATILE_FIELDS = frozenset({"timestamp", "user_agent", "referrer"})
+
+
+def _normalize_value(key: str, value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize_value(k, v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_normalize_value(key, v) for v in value]
+    if isinstance(value, str):
+        if key == "phone":
+            return re.sub(r"\D", "", value)
+        value = " ".join(value.split())
+        return value.lower() if key == "email" else value
+    return value
+
+
+def payload_fingerprint(data: dict) -> str:
+    """Hash canónico (SHA-256) del payload normalizado"""
+    canonical = json.dumps(
+        _normalize_value("", data), sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Resultados por clave con expiración y tamaño máximo (se expulsa la más antigua)
+    """
+
+    def __init__(self, max_entries: int = 50_000):
+        self.max_entries = max_entries
+        # clave -> (expira_en, resultado)
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._results[key]
+            return None
+        return result
+
+    def seen(self, key: str) -> bool:
+        """Hay un resultado vigente o una ejecución en curso para la clave"""
+        return key in self._inflight or self.get(key) is not None
+
+    def forget(self, key: str) -> None:
+        """Descarta el resultado guardado (ej: el contactId dejó de existir)"""
+        self._results.pop(key, None)
+
+    def put(self, key: str, result: Any, ttl: float) -> None:
+        self._results[key] = (time.monotonic() + ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def run(
+        self, key: str, ttl: float, producer: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Ejecuta `producer` una sola vez por clave dentro de `ttl`
+
+        Returns:
+            (resultado, replayed) — replayed es True si se devolvió un
+            resultado previo o el de una petición concurrente
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await producer()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar "exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            self.put(key, result, ttl)
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,99 @@
+"""
+Lectura y escritura rápida de JSON para los endpoints del webhook
+
+- El cuerpo se lee en streaming con un tamaño máximo: un POST gigante se
+  corta en cuanto supera el límite (o antes, si Content-Length ya lo dice),
+  sin acumularlo entero en memoria.
+- Un Content-Type que no es JSON se rechaza antes de leer el cuerpo.
+- Se usa orjson si está instalado (decodifica y codifica varias veces más
+  rápido que json); si no, la librería estándar.
+"""
+import json
+import os
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", "65536"))
+
+
+class BodyError(Exception):
+    """El cuerpo de la petición no se puede aceptar"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+if orjson is not None:
+    def loads(raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+else:
+    def loads(raw: bytes) -> Any:
+        return json.loads(raw)
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa con orjson cuando está disponible"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def is_json_content_type(content_type: Optional[str]) -> bool:
+    """
+    True para application/json y tipos +json
+
+    Sin cabecera se acepta (clientes simples como curl sin -H).
+    """
+    if not content_type:
+        return True
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+
+async def read_body(request: Request, max_bytes: int = MAX_BODY_BYTES) -> bytes:
+    """Lee el cuerpo completo cortando en cuanto supera max_bytes"""
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            if int(content_length) > max_bytes:
+                raise BodyError(413, f"El cuerpo supera {max_bytes} bytes")
+        except ValueError:
+            raise BodyError(400, "Content-Length inválido")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise BodyError(413, f"El cuerpo supera {max_bytes} bytes")
+    return bytes(body)
+
+
+async def read_json_body(request: Request, max_bytes: int = MAX_BODY_BYTES) -> Any:
+    """
+    Valida Content-Type y tamaño y decodifica el cuerpo JSON
+
+    Raises:
+        BodyError: 415 (no es JSON), 413 (demasiado grande) o 400 (JSON inválido)
+    """
+    if not is_json_content_type(request.headers.get("content-type")):
+        raise BodyError(415, "Content-Type debe ser application/json")
+    body = await read_body(request, max_bytes)
+    try:
+        return loads(body)
+    except ValueError:
+        raise BodyError(400, "JSON inválido")
@@ -0,0 +1,143 @@
+"""
+Monitor de lag del event loop
+
+Una tarea del loop duerme `interval` segundos en bucle y mide cuánto tarde
+despierta (lag de planificación): si una llamada bloqueante (requests,
+SQLite sin to_thread, un cálculo largo) retiene el loop, el lag sube. Cada
+medida va al histograma event_loop_lag_seconds de /metrics.
+
+El stack no se puede tomar desde el propio loop (está bloqueado), así que
+un hilo vigía revisa el último latido: si el loop lleva más de `threshold`
+segundos sin latir, captura el stack del hilo del loop y la tarea que se
+estaba ejecutando, lo registra en el log y lo guarda en un buffer que se
+consulta en GET /admin/loop-stalls.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.25"))
+LOOP_STALL_BUFFER = int(os.getenv("LOOP_STALL_BUFFER", "20"))
+
+# Lag de planificación: de 1 ms a bloqueos de varios segundos
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+loop_lag = metrics.Histogram("event_loop_lag_seconds", "Retraso de planificación del event loop", buckets=LAG_BUCKETS)
+loop_stalls = metrics.Counter("event_loop_stalls_total", "Bloqueos del event loop por encima del umbral")
+
+
+class LoopLagMonitor:
+    """
+    Args:
+        interval: Cada cuánto se mide el lag (segundos)
+        threshold: Bloqueo a partir del cual se captura el stack (segundos)
+        history: Número de bloqueos guardados para /admin/loop-stalls
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD,
+                 history: int = LOOP_STALL_BUFFER):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=history)
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Arranca la medición (llamar desde el event loop, ej. en startup)"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._last_beat = time.monotonic()
+            loop_lag.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def _watch(self) -> None:
+        captured_beat = None
+        while not self._stopping.wait(self.interval / 2):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for >= self.threshold and captured_beat != last_beat:
+                # Un solo stack por bloqueo
+                captured_beat = last_beat
+                self._capture(blocked_for)
+
+    def _capture(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=25) if frame is not None else []
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+            if current is not None:
+                task = f"{current.get_name()} {current.get_coro()!r}"
+        except RuntimeError:
+            pass
+        stall = {
+            "at": time.time(),
+            "blocked_for_ms": round(blocked_for * 1000, 1),
+            "task": task,
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stalls.append(stall)
+        loop_stalls.inc()
+        location = stack[-1].strip().splitlines()[0] if stack else "desconocido"
+        logger.warning(
+            f"🐢 Event loop bloqueado {stall['blocked_for_ms']} ms en {location}",
+            extra={"event": "loop_stall", "task": task, "stack": stall["stack"]}
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "interval": self.interval,
+            "threshold_ms": self.threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": len(self.stalls),
+        }
+
+    def recent_stalls(self) -> List[dict]:
+        return list(reversed(self.stalls))
+
+
+loop_monitor = LoopLagMonitor()
@@ -1,25 +1,42 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import requests
+from fastapi.responses import StreamingResponse, Response
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 import pytz
-from collections import defaultdict
-from typing import Dict, Optional
+from typing import Optional
 import re
+import asyncio
+import tempfile
+import hmac
+
+from ghl_client import ghl_request, close_client, retry_stats, breaker, governor
+from circuit_breaker import CircuitOpenError
+from custom_fields import CustomFieldCatalog
+from submission_queue import SubmissionQueue, QUEUE_STATUSES
+from delivery import DeliveryWorkerPool, StaleContactError
+from priority_lanes import LaneScheduler, lane_for, lane_depth
+from contact_shards import submission_contact_key
+from contact_index import ContactIndex
+from rate_limiter import SlidingWindowRateLimiter
+from idempotency import IdempotencyStore, payload_fingerprint
+from structured_logging import setup_logging, logging_stats
+import metrics
+from metrics import MetricsMiddleware
+from loop_monitor import loop_monitor
+from admission import AdmissionController, AdmissionMiddleware
+from request_trace import TraceMiddleware, span, annotate, slow_traces, admin_authorized
+from json_body import BodyError, FastJSONResponse, read_json_body, loads as json_loads, dumps as json_dumps
 
 # ============================================
 # CONFIGURACIÓN DE LOGGING MEJORADO
 # Última actualización: 2024-11-18
 # ============================================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# JSON por cola y hilo de escritura, con PII enmascarada (structured_logging)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # ============================================
@@ -29,9 +46,15 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Jet Cargo → GoHighLevel Integration V2.0",
     description="Webhook mejorado con validación, rate limiting y mejor manejo de errores",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Control de admisión: 503 + Retry-After cuando hay demasiados envíos en curso
+# (va por dentro de CORS para que el 503 llegue al navegador con sus cabeceras)
+submit_admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=submit_admission, paths=["/webhook/submit", "/webhook/submit/batch"])
+
 # CORS - permitir TODOS los orígenes
 app.add_middleware(
     CORSMiddleware,
@@ -41,13 +64,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Conteo y latencia de los endpoints de envío (GET /metrics)
+app.add_middleware(MetricsMiddleware, paths=["/webhook/submit", "/webhook/submit/batch"])
+# Server-Timing por etapa y trazas de peticiones lentas (GET /admin/traces)
+app.add_middleware(TraceMiddleware, paths=["/webhook/submit"])
+
 # ============================================
 # CONFIGURACIÓN
 # ============================================
 
 GHL_API_KEY = os.getenv("GOHIGHLEVEL_API_KEY")
 GHL_LOCATION_ID = os.getenv("GOHIGHLEVEL_LOCATION_ID")
-GHL_API_BASE = "https://services.leadconnectorhq.com"
 
 # Validar configuración al inicio
 if not GHL_API_KEY:
@@ -56,53 +83,50 @@ if not GHL_LOCATION_ID:
     logger.error("❌ GOHIGHLEVEL_LOCATION_ID no está configurada")
 
 # ============================================
-# RATE LIMITING
+# CUSTOM FIELDS
 # ============================================
 
-# Cache simple para rate limiting (en producción usar Redis)
-submission_cache: Dict[str, list] = defaultdict(list)
+CUSTOM_FIELDS_TTL = float(os.getenv("CUSTOM_FIELDS_TTL", "300"))
+CUSTOM_FIELDS_FAILURE_BACKOFF = float(os.getenv("CUSTOM_FIELDS_FAILURE_BACKOFF", "30"))
 
+# Catálogo compartido: una sola descarga de customFields por TTL
+custom_field_catalog = CustomFieldCatalog(
+    GHL_LOCATION_ID, ttl=CUSTOM_FIELDS_TTL, failure_backoff=CUSTOM_FIELDS_FAILURE_BACKOFF
+)
 
-def get_custom_field_id_by_name(field_name: str) -> str | None:
+
+async def get_custom_field_id_by_name(field_name: str) -> str | None:
     """
     Busca el ID de un custom field de contacto en GoHighLevel por su nombre visible.
     Devuelve el ID (string) o None si no lo encuentra.
     """
     try:
-        url = f"{GHL_API_BASE}/locations/{GHL_LOCATION_ID}/customFields"
-        params = {
-            "model": "contact"   # muy importante: modelo contacto
-        }
-        headers = {
-            "Authorization": f"Bearer {GHL_API_KEY}",
-            "Version": "2021-07-28",
-            "Accept": "application/json"
-        }
-
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
-        if resp.status_code != 200:
-            logger.error(f"❌ Error obteniendo custom fields GHL: {resp.status_code} - {resp.text}")
-            return None
-
-        data = resp.json()
-        fields = data.get("customFields", []) or data.get("custom_fields", [])
-
-        # Normalizar nombre (case insensitive)
-        field_name_lower = field_name.strip().lower()
-
-        for f in fields:
-            name = (f.get("name") or "").strip().lower()
-            if name == field_name_lower:
-                field_id = f.get("id")
-                logger.info(f"✅ Custom field '{field_name}' encontrado: {field_id}")
-                return field_id
+        with span("custom_field_lookup"):
+            field_id = await custom_field_catalog.get_id(field_name)
+        if field_id:
+            logger.info(f"✅ Custom field '{field_name}' encontrado: {field_id}")
+            return field_id
 
         logger.warning(f"⚠️ Custom field '{field_name}' no encontrado en GHL.")
         return None
 
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"❌ Excepción buscando custom field '{field_name}': {e}")
         return None
+
+
+# ============================================
+# RATE LIMITING
+# ============================================
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "300"))
+
+# Ventana deslizante con memoria constante por IP (en producción multi-instancia usar Redis)
+rate_limiter = SlidingWindowRateLimiter(max_keys=RATE_LIMIT_MAX_KEYS)
+
 def check_rate_limit(client_ip: str, max_requests: int = 5, time_window: int = 3600) -> bool:
     """
     Verifica si el cliente ha excedido el límite de peticiones
@@ -115,21 +139,10 @@ def check_rate_limit(client_ip: str, max_requests: int = 5, time_window: int = 3
     Returns:
         True si está dentro del límite, False si lo excedió
     """
-    now = datetime.now()
-    
-    # Limpiar peticiones antiguas
-    submission_cache[client_ip] = [
-        ts for ts in submission_cache[client_ip]
-        if now - ts < timedelta(seconds=time_window)
-    ]
-    
-    # Verificar límite
-    if len(submission_cache[client_ip]) >= max_requests:
+    if not rate_limiter.allow(client_ip, max_requests, time_window):
+        metrics.rate_limit_rejections.inc()
         logger.warning(f"⚠️ Rate limit excedido para IP: {client_ip}")
         return False
-    
-    # Agregar nueva petición
-    submission_cache[client_ip].append(now)
     return True
 
 # ============================================
@@ -138,14 +151,14 @@ def check_rate_limit(client_ip: str, max_requests: int = 5, time_window: int = 3
 
 def validate_email(email: str) -> bool:
     """Valida formato de email"""
-    if not email:
+    if not email or not isinstance(email, str):
         return False
     pattern = r'^[^\s@]+@[^\s@]+\.[^\s@]+$'
     return re.match(pattern, email) is not None
 
 def validate_phone(phone: str) -> bool:
     """Valida formato de teléfono"""
-    if not phone:
+    if not phone or not isinstance(phone, str):
         return False
     # Remover caracteres no numéricos
     clean_phone = re.sub(r'\D', '', phone)
@@ -154,10 +167,28 @@ def validate_phone(phone: str) -> bool:
 
 def validate_name(name: str) -> bool:
     """Valida nombre"""
-    if not name:
+    if not name or not isinstance(name, str):
         return False
     return len(name.strip()) >= 2
 
+# Motivo (etiqueta de métricas) de cada error de validate_form_data
+VALIDATION_REASONS = {
+    "Nombre inválido o faltante": "invalid_name",
+    "Email es requerido": "missing_email",
+    "Formato de email inválido": "invalid_email",
+    "Teléfono es requerido": "missing_phone",
+    "Formato de teléfono inválido (mínimo 10 dígitos)": "invalid_phone",
+    "Registro con campos de tipo inválido": "invalid_type",
+}
+
+# Motivo de rechazo del cuerpo según el código de BodyError
+BODY_REJECTION_REASONS = {400: "invalid_json", 413: "body_too_large", 415: "unsupported_content_type"}
+
+def record_validation_failures(errors: list) -> None:
+    """Cuenta los errores de validación por motivo"""
+    for error in errors:
+        metrics.validation_failures.inc(VALIDATION_REASONS.get(error, "other"))
+
 def validate_form_data(data: dict) -> tuple[bool, list]:
     """
     Valida los datos del formulario
@@ -210,19 +241,41 @@ SERVICE_TO_PIPELINE = {
     "general_contact": "zar5aTjIKP8srIK5x0qk"
 }
 
-def get_pipeline_id(service_type: str) -> str:
+async def get_pipeline_id(service_type: str) -> str:
     """Obtiene el ID del pipeline basado en el tipo de servicio"""
-    return get_custom_field_id_by_name(service_type)
+    return await get_custom_field_id_by_name(service_type)
 
 # ============================================
 # FUNCIONES DE GOHIGHLEVEL
 # ============================================
 
-def create_ghl_opportunity(contact_id: str, data: dict) -> Optional[dict]:
+CONTACT_INDEX_PATH = os.getenv("CONTACT_INDEX_PATH", "contacts.db")
+
+# Índice local email/teléfono → contactId para clientes que vuelven
+contact_index = ContactIndex(CONTACT_INDEX_PATH)
+
+# Envíos del mismo contacto dentro de esta ventana (doble clic, varias
+# pestañas) comparten la resolución del contacto: el segundo espera el
+# contactId del primero en vez de repetir POST /contacts/ y la búsqueda
+CONTACT_MERGE_WINDOW = float(os.getenv("CONTACT_MERGE_WINDOW", "10"))
+contact_resolutions = IdempotencyStore(max_entries=10_000)
+
+def is_missing_contact_response(response) -> bool:
+    """GHL indica que el contactId de la petición no existe"""
+    if response.status_code not in (400, 404, 422):
+        return False
+    text = response.text.lower()
+    return "contact" in text and ("not found" in text or "does not exist" in text)
+
+async def create_ghl_opportunity(contact_id: str, data: dict) -> Optional[dict]:
     """Crea una Oportunidad en GoHighLevel"""
     try:
         service_type = data.get("service_type", "general_contact")
-        pipeline_id = get_pipeline_id(service_type)
+        pipeline_id = await get_pipeline_id(service_type)
+        if not pipeline_id:
+            # Sin pipeline GHL rechaza la oportunidad: la entrega se reintenta más tarde
+            logger.error(f"❌ Sin pipeline para '{service_type}', no se crea la oportunidad")
+            return None
         
         # Crear título descriptivo
         miami_tz = pytz.timezone('America/New_York')
@@ -245,17 +298,11 @@ def create_ghl_opportunity(contact_id: str, data: dict) -> Optional[dict]:
         
         logger.info(f"📤 Creando Oportunidad: {title}")
         
-        headers = {
-            "Authorization": f"Bearer {GHL_API_KEY}",
-            "Version": "2021-07-28",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            f"{GHL_API_BASE}/opportunities/",
-            json=opportunity_payload,
-            headers=headers,
-            timeout=30
+        response = await ghl_request(
+            "POST",
+            "/opportunities/",
+            endpoint="opportunities",
+            json=opportunity_payload
         )
         
         if response.status_code in [200, 201]:
@@ -263,22 +310,45 @@ def create_ghl_opportunity(contact_id: str, data: dict) -> Optional[dict]:
             opp_id = result.get('opportunity', {}).get('id', 'unknown')
             logger.info(f"✅ Oportunidad creada: {opp_id}")
             return result
+        elif is_missing_contact_response(response):
+            removed = await asyncio.to_thread(contact_index.invalidate, contact_id)
+            contact_resolutions.forget(submission_contact_key(data))
+            logger.warning(f"⚠️ Contacto {contact_id} ya no existe en GHL ({removed} identidades invalidadas)")
+            raise StaleContactError(f"contact {contact_id} not found")
         else:
-            logger.error(f"❌ Error creando oportunidad: {response.text}")
+            logger.error(
+                "❌ Error creando oportunidad",
+                extra={"event": "ghl_error", "status": response.status_code, "body": response.text}
+            )
             return None
         
+    except (StaleContactError, CircuitOpenError):
+        raise
     except Exception as e:
         logger.error(f"❌ Excepción creando oportunidad: {str(e)}")
         return None
 
-def create_ghl_contact(data: dict) -> Optional[dict]:
-    """Crea un contacto en GoHighLevel"""
+async def upsert_ghl_contact(data: dict) -> Optional[dict]:
+    """
+    Crea un contacto en GoHighLevel o, si ya existe, resuelve el existente.
+    No crea oportunidad.
+    
+    Returns:
+        {"contact": {...}, "is_duplicate": bool} o None si no se pudo resolver
+    """
     try:
         email = data.get("email", "")
         phone = data.get("phone", "")
         name = data.get("name", "Unknown")
         service_type = data.get("service_type", "general_contact")
         
+        # Cliente conocido: usar el contactId del índice local
+        known_contact_id = await asyncio.to_thread(contact_index.lookup, email, phone)
+        if known_contact_id:
+            logger.info(f"✅ Contacto conocido en índice local: {known_contact_id}")
+            metrics.ghl_contacts.inc("duplicate")
+            return {"contact": {"id": known_contact_id}, "is_duplicate": True}
+        
         # Preparar payload
         ghl_payload = {
             "locationId": GHL_LOCATION_ID,
@@ -310,8 +380,8 @@ def create_ghl_contact(data: dict) -> Optional[dict]:
         
         ghl_payload["tags"] = tags
         
-          service_type_field_id = get_custom_field_id_by_name("service_type")
-logger.info(f"📤 service_type_field_id : {service_type_field_id}")
+        service_type_field_id = await get_custom_field_id_by_name("service_type")
+        logger.info(f"📤 service_type_field_id : {service_type_field_id}")
         if service_type_field_id:
             ghl_payload["customFields"] = [{
                 "id": service_type_field_id,
@@ -323,31 +393,36 @@ logger.info(f"📤 service_type_field_id : {service_type_field_id}")
         logger.info(f"📤 Creando contacto: {email}")
         
         # Enviar a GoHighLevel
-        headers = {
-            "Authorization": f"Bearer {GHL_API_KEY}",
-            "Version": "2021-07-28",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            f"{GHL_API_BASE}/contacts/",
-            json=ghl_payload,
-            headers=headers,
-            timeout=30
+        response = await ghl_request(
+            "POST",
+            "/contacts/",
+            endpoint="contacts",
+            json=ghl_payload
         )
         
         logger.info(f"📊 GHL Response Status: {response.status_code}")
         
-        # Si es duplicado, buscar contacto existente y crear oportunidad
+        # Si es duplicado, usar el contactId que reporta GHL o buscar el existente
         if response.status_code == 400 and "duplicate" in response.text.lower():
+            try:
+                duplicate_contact_id = response.json().get("meta", {}).get("contactId")
+            except ValueError:
+                duplicate_contact_id = None
+            
+            if duplicate_contact_id:
+                logger.info(f"✅ Contacto duplicado, ya existe en GHL: {duplicate_contact_id}")
+                await asyncio.to_thread(contact_index.remember, duplicate_contact_id, email, phone)
+                metrics.ghl_contacts.inc("duplicate")
+                return {"contact": {"id": duplicate_contact_id}, "is_duplicate": True}
+            
             logger.info(f"ℹ️ Contacto duplicado detectado, buscando contacto existente...")
             
             # Buscar contacto por email
-            search_response = requests.get(
-                f"{GHL_API_BASE}/contacts/",
-                params={"locationId": GHL_LOCATION_ID, "email": email},
-                headers=headers,
-                timeout=30
+            search_response = await ghl_request(
+                "GET",
+                "/contacts/",
+                endpoint="contacts_search",
+                params={"locationId": GHL_LOCATION_ID, "email": email}
             )
             
             if search_response.status_code == 200:
@@ -355,39 +430,76 @@ logger.info(f"📤 service_type_field_id : {service_type_field_id}")
                 if contacts:
                     existing_contact_id = contacts[0].get("id")
                     logger.info(f"✅ Contacto existente encontrado: {existing_contact_id}")
-                    
-                    # Crear oportunidad para contacto existente
-                    create_ghl_opportunity(existing_contact_id, data)
-                    
-                    return {
-                        "contact": contacts[0],
-                        "is_duplicate": True,
-                        "message": "Contacto ya existe, oportunidad creada"
-                    }
+                    await asyncio.to_thread(contact_index.remember, existing_contact_id, email, phone)
+                    metrics.ghl_contacts.inc("duplicate")
+                    return {"contact": contacts[0], "is_duplicate": True}
             
-            return {
-                "success": False,
-                "message": "Contacto duplicado pero no se pudo crear oportunidad"
-            }
+            logger.error("❌ Contacto duplicado pero no se encontró en la búsqueda")
+            return None
         
         # Si se creó exitosamente
         if response.status_code in [200, 201]:
             result = response.json()
             contact_id = result.get("contact", {}).get("id")
             logger.info(f"✅ Contacto creado: {contact_id}")
-            
-            # Crear oportunidad
-            create_ghl_opportunity(contact_id, data)
-            
-            return result
+            await asyncio.to_thread(contact_index.remember, contact_id, email, phone)
+            metrics.ghl_contacts.inc("created")
+            return {"contact": result.get("contact", {}), "is_duplicate": False}
         else:
-            logger.error(f"❌ Error creando contacto: {response.text}")
+            logger.error(
+                "❌ Error creando contacto",
+                extra={"event": "ghl_error", "status": response.status_code, "body": response.text}
+            )
             return None
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"❌ Excepción creando contacto: {str(e)}")
         return None
 
+async def resolve_contact(data: dict) -> Optional[dict]:
+    """upsert_ghl_contact compartido entre envíos del mismo contacto (CONTACT_MERGE_WINDOW)"""
+    key = submission_contact_key(data)
+    if key is None or CONTACT_MERGE_WINDOW <= 0:
+        return await upsert_ghl_contact(data)
+    contact, shared = await contact_resolutions.run(
+        key, CONTACT_MERGE_WINDOW, lambda: upsert_ghl_contact(data)
+    )
+    if shared and contact:
+        metrics.ghl_contact_resolutions_shared.inc()
+        logger.info(f"🔗 contactId compartido con un envío reciente: {contact['contact'].get('id')}")
+    return contact
+
+async def resolve_ghl_contact_id(data: dict) -> Optional[str]:
+    """Paso de contacto de la entrega: devuelve el contactId (nuevo o existente)"""
+    contact = await resolve_contact(data)
+    if not contact:
+        return None
+    return contact["contact"].get("id")
+
+# ============================================
+# COLA DE ENVÍOS Y ENTREGA EN SEGUNDO PLANO
+# ============================================
+
+SUBMISSION_QUEUE_PATH = os.getenv("SUBMISSION_QUEUE_PATH", "submissions.db")
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_POLL_INTERVAL = float(os.getenv("DELIVERY_POLL_INTERVAL", "1.0"))
+
+# Con backlog se entregan primero los servicios urgentes (priority_lanes.py);
+# los envíos de un mismo contacto, en orden y nunca a la vez (contact_shards.py)
+submission_queue = SubmissionQueue(
+    SUBMISSION_QUEUE_PATH, lane_of=lane_for, contact_key_of=submission_contact_key
+)
+delivery_pool = DeliveryWorkerPool(
+    submission_queue,
+    contact_step=resolve_ghl_contact_id,
+    opportunity_step=create_ghl_opportunity,
+    workers=DELIVERY_WORKERS,
+    poll_interval=DELIVERY_POLL_INTERVAL,
+    scheduler=LaneScheduler()
+)
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -407,6 +519,39 @@ async def root():
         ]
     }
 
+queue_depth = metrics.Gauge("submission_queue_items", "Envíos en la cola por estado", ("status",))
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas en formato Prometheus"""
+    counts = await asyncio.to_thread(submission_queue.counts)
+    # Todos los estados, con 0 si no hay envíos: un estado que se vació no
+    # debe seguir mostrando su último valor
+    for status in QUEUE_STATUSES:
+        queue_depth.set(counts.get(status, 0), status)
+    lanes = await asyncio.to_thread(submission_queue.lane_counts)
+    for lane in delivery_pool.scheduler.lanes:
+        lane_depth.set(lanes.get(lane, 0), lane)
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/admin/traces")
+async def admin_traces(request: Request, limit: int = 20):
+    """Trazas completas de los envíos y entregas más lentos"""
+    if not admin_authorized(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "threshold_ms": slow_traces.threshold * 1000,
+        "recorded": slow_traces.recorded,
+        "traces": slow_traces.snapshot(limit)
+    }
+
+@app.get("/admin/loop-stalls")
+async def admin_loop_stalls(request: Request):
+    """Bloqueos recientes del event loop con el stack que los causó"""
+    if not admin_authorized(request.headers.get("X-Admin-Token")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {**loop_monitor.snapshot(), "recent": loop_monitor.recent_stalls()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -415,50 +560,89 @@ async def health_check():
         "location_id_configured": bool(GHL_LOCATION_ID)
     }
     
+    queue_status = await asyncio.to_thread(submission_queue.counts)
+    
     return {
-        "status": "healthy",
+        "status": "healthy" if breaker.state == "closed" else "degraded",
         "timestamp": datetime.now().isoformat(),
-        "config": config_status
+        "config": config_status,
+        "queue": queue_status,
+        "queue_lanes": await asyncio.to_thread(submission_queue.lane_counts),
+        "ghl_retries": retry_stats.snapshot(),
+        "logging": logging_stats(),
+        "event_loop": loop_monitor.snapshot(),
+        "admission": submit_admission.snapshot(),
+        "ghl_circuit_breaker": breaker.snapshot(),
+        "ghl_rate_governor": await asyncio.to_thread(governor.snapshot)
     }
 
+IDEMPOTENCY_WINDOW = float(os.getenv("IDEMPOTENCY_WINDOW", "600"))
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "50000"))
+
+idempotency_store = IdempotencyStore(max_entries=IDEMPOTENCY_MAX_ENTRIES)
+
 @app.post("/webhook/submit")
 async def handle_webhook(request: Request):
     """
     Endpoint principal para recibir formularios
     
     Validaciones:
-    - Rate limiting por IP
+    - Rate limiting por IP (los reenvíos de un envío ya aceptado no cuentan)
     - Validación de datos requeridos
     - Formato de email y teléfono
+    - Idempotencia (cabecera Idempotency-Key o hash del payload); una
+      Idempotency-Key reutilizada con otro cuerpo se rechaza con 422
     """
     try:
         # Obtener IP del cliente
         client_ip = request.client.host
         logger.info(f"📥 Nueva petición desde IP: {client_ip}")
         
-        # Verificar rate limit
-        if not check_rate_limit(client_ip, max_requests=5, time_window=3600):
+        # Obtener datos del formulario (tipo y tamaño se comprueban antes de leerlo)
+        try:
+            with span("parse"):
+                data = await read_json_body(request)
+        except BodyError as e:
+            logger.warning(f"⚠️ Cuerpo rechazado ({e.status_code}): {e.message}")
+            metrics.validation_failures.inc(BODY_REJECTION_REASONS.get(e.status_code, "invalid_body"))
             raise HTTPException(
-                status_code=429,
-                detail="Demasiadas peticiones. Por favor intenta de nuevo más tarde."
+                status_code=e.status_code,
+                detail="Datos inválidos. Por favor verifica el formato." if e.status_code == 400 else e.message
             )
-        
-        # Obtener datos del formulario
-        try:
-            data = await request.json()
-        except Exception as e:
-            logger.error(f"❌ Error parseando JSON: {str(e)}")
+        if not isinstance(data, dict):
+            metrics.validation_failures.inc("invalid_json")
             raise HTTPException(
                 status_code=400,
                 detail="Datos inválidos. Por favor verifica el formato."
             )
         
-        logger.info(f"📊 Datos recibidos: {data}")
+        logger.info("📊 Datos recibidos", extra={"event": "payload_received", "payload": data})
+        
+        # Reenvíos (recargas, doble clic, reintentos) devuelven la respuesta original
+        fingerprint = payload_fingerprint(data)
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key:
+            key, ttl = f"key:{idempotency_key}", IDEMPOTENCY_KEY_TTL
+        else:
+            key, ttl = f"hash:{fingerprint}", IDEMPOTENCY_WINDOW
+        
+        # Verificar rate limit (un reenvío no gasta cupo: no vuelve a encolar)
+        if not idempotency_store.seen(key):
+            with span("rate_limit"):
+                allowed = check_rate_limit(client_ip, max_requests=5, time_window=3600)
+            if not allowed:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Demasiadas peticiones. Por favor intenta de nuevo más tarde."
+                )
         
         # Validar datos
-        is_valid, errors = validate_form_data(data)
+        with span("validate"):
+            is_valid, errors = validate_form_data(data)
         if not is_valid:
             logger.warning(f"⚠️ Validación fallida: {errors}")
+            record_validation_failures(errors)
             raise HTTPException(
                 status_code=400,
                 detail={"errors": errors, "message": "Datos de formulario inválidos"}
@@ -472,25 +656,43 @@ async def handle_webhook(request: Request):
                 detail="Error de configuración del servidor"
             )
         
-        # Crear contacto en GoHighLevel
-        result = create_ghl_contact(data)
+        async def enqueue_submission() -> dict:
+            # Guardar en la cola; la entrega a GoHighLevel ocurre en segundo plano
+            submission_id = await asyncio.to_thread(submission_queue.enqueue, data)
+            delivery_pool.notify()
+            logger.info(f"✅ Envío {submission_id} encolado")
+            return {
+                "success": True,
+                "message": "Submission accepted",
+                "submission_id": submission_id
+            }
         
-        if result:
-            logger.info("✅ Procesamiento exitoso")
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Contact created successfully",
-                    "ghl_contact_id": result.get("contact", {}).get("id", "unknown")
-                }
-            )
-        else:
-            logger.error("❌ Error procesando formulario")
-            raise HTTPException(
-                status_code=500,
-                detail="Error procesando el formulario. Por favor intenta de nuevo."
-            )
+        # Con Idempotency-Key se guarda también la huella del cuerpo: la misma
+        # clave con otro cuerpo es un error del cliente, no un reenvío
+        async def enqueue_keyed_submission() -> dict:
+            return {"fingerprint": fingerprint, "content": await enqueue_submission()}
+        
+        with span("enqueue"):
+            if idempotency_key:
+                entry, replayed = await idempotency_store.run(key, ttl, enqueue_keyed_submission)
+                if entry["fingerprint"] != fingerprint:
+                    logger.warning("⚠️ Idempotency-Key reutilizada con otro cuerpo")
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key ya usada con un cuerpo distinto"
+                    )
+                content = entry["content"]
+            else:
+                content, replayed = await idempotency_store.run(key, ttl, enqueue_submission)
+        annotate(submission_id=content["submission_id"], replayed=replayed)
+        if replayed:
+            logger.info(f"ℹ️ Envío repetido, se devuelve {content['submission_id']}")
+        
+        return FastJSONResponse(
+            status_code=202,
+            content=content,
+            headers={"Idempotent-Replayed": "true"} if replayed else None
+        )
         
     except HTTPException:
         raise
@@ -501,6 +703,229 @@ async def handle_webhook(request: Request):
             detail="Error interno del servidor"
         )
 
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+BATCH_MAX_LINE_BYTES = int(os.getenv("BATCH_MAX_LINE_BYTES", "65536"))
+# Registros por lote; lo que pase de aquí no se lee ni se encola
+BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", "1000"))
+# Registros aceptados por IP y hora (cada registro cuenta como un envío)
+BATCH_RATE_LIMIT = int(os.getenv("BATCH_RATE_LIMIT", "1000"))
+# Sin BATCH_TOKEN configurado el endpoint de lotes queda cerrado
+BATCH_TOKEN = os.getenv("BATCH_TOKEN")
+# Resultados en memoria hasta este tamaño; después se vuelcan a disco
+BATCH_RESULTS_SPOOL_BYTES = 1024 * 1024
+
+
+async def iter_ndjson_lines(request: Request):
+    """
+    Lee el cuerpo en streaming y devuelve (número de línea, bytes | None)
+    
+    Las líneas más largas que BATCH_MAX_LINE_BYTES se descartan sin
+    acumularlas (se devuelven como None) para acotar la memoria.
+    """
+    buffer = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not oversized:
+                    buffer += chunk[start:]
+                    if len(buffer) > BATCH_MAX_LINE_BYTES:
+                        oversized = True
+                        buffer.clear()
+                break
+            line_no += 1
+            if oversized:
+                yield line_no, None
+            else:
+                buffer += chunk[start:end]
+                yield line_no, bytes(buffer) if len(buffer) <= BATCH_MAX_LINE_BYTES else None
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    if oversized or buffer.strip():
+        line_no += 1
+        yield line_no, None if oversized else bytes(buffer)
+
+
+def batch_authorized(token: Optional[str]) -> bool:
+    """Compara X-Batch-Token con BATCH_TOKEN; sin BATCH_TOKEN no se autoriza"""
+    if not BATCH_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), BATCH_TOKEN.encode())
+
+
+def parse_batch_record(raw: Optional[bytes]) -> tuple[Optional[dict], list]:
+    """Decodifica y valida una línea del lote; devuelve (datos, errores)"""
+    if raw is None:
+        return None, [f"Línea mayor a {BATCH_MAX_LINE_BYTES} bytes"]
+    try:
+        data = json_loads(raw)
+    except ValueError:
+        return None, ["JSON inválido"]
+    if not isinstance(data, dict):
+        return None, ["Se esperaba un objeto JSON"]
+    try:
+        is_valid, errors = validate_form_data(data)
+    except Exception as e:
+        # Un registro raro no debe tumbar el lote entero
+        logger.warning(f"⚠️ Registro del lote no validable: {str(e)}")
+        errors = ["Registro con campos de tipo inválido"]
+        record_validation_failures(errors)
+        return None, errors
+    if not is_valid:
+        record_validation_failures(errors)
+        return None, errors
+    return data, []
+
+
+@app.post("/webhook/submit/batch")
+async def handle_webhook_batch(request: Request):
+    """
+    Ingesta por lotes: cuerpo NDJSON (un formulario JSON por línea)
+    
+    Requiere la cabecera X-Batch-Token igual a BATCH_TOKEN (sin BATCH_TOKEN
+    configurado responde 403). Cada registro se valida con
+    validate_form_data, los válidos se encolan en bloques de
+    BATCH_CHUNK_SIZE (una transacción por bloque) y la respuesta es NDJSON
+    con un resultado por línea y un resumen final.
+    
+    Límites: cada registro aceptado consume una petición del rate limit de
+    lotes de la IP (BATCH_RATE_LIMIT por hora) y se leen como mucho
+    BATCH_MAX_RECORDS registros. Al agotarse cualquiera de los dos se deja
+    de leer: la línea que no entró sale como "rejected" y el resumen
+    indica "truncated": true; lo anterior ya quedó encolado.
+    
+    La respuesta NO es streaming por registro: se envía cuando se terminó
+    de leer el lote completo. Hasta entonces los resultados se acumulan en
+    un archivo temporal, así la memoria usada no depende del tamaño del
+    lote.
+    """
+    client_ip = request.client.host
+    logger.info(f"📥 Nuevo lote desde IP: {client_ip}")
+    
+    if not batch_authorized(request.headers.get("X-Batch-Token")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    
+    if not GHL_API_KEY or not GHL_LOCATION_ID:
+        logger.error("❌ Configuración de GoHighLevel faltante")
+        raise HTTPException(
+            status_code=500,
+            detail="Error de configuración del servidor"
+        )
+    
+    results = tempfile.SpooledTemporaryFile(max_size=BATCH_RESULTS_SPOOL_BYTES)
+    summary = {"accepted": 0, "duplicate": 0, "invalid": 0, "rejected": 0, "truncated": False}
+    # Resultados del bloque en orden de línea; los válidos se completan al encolar
+    chunk_results: list = []
+    chunk_pending: list = []
+    chunk_duplicates: list = []
+    
+    async def flush_chunk():
+        if chunk_pending:
+            ids = await asyncio.to_thread(
+                submission_queue.enqueue_many, [data for _, data, _ in chunk_pending]
+            )
+            for (result, _, key), submission_id in zip(chunk_pending, ids):
+                result["submission_id"] = submission_id
+                idempotency_store.put(key, {
+                    "success": True,
+                    "message": "Submission accepted",
+                    "submission_id": submission_id
+                }, IDEMPOTENCY_WINDOW)
+            delivery_pool.notify()
+        for result, original in chunk_duplicates:
+            result["submission_id"] = original.get("submission_id")
+        for result in chunk_results:
+            results.write(json_dumps(result) + b"\n")
+        chunk_results.clear()
+        chunk_pending.clear()
+        chunk_duplicates.clear()
+    
+    try:
+        seen_in_chunk: dict = {}
+        records = 0
+        async for line_no, raw in iter_ndjson_lines(request):
+            if raw is not None and not raw.strip():
+                continue
+            records += 1
+            if records > BATCH_MAX_RECORDS:
+                summary["rejected"] += 1
+                summary["truncated"] = True
+                chunk_results.append({
+                    "line": line_no, "status": "rejected",
+                    "errors": [f"El lote supera {BATCH_MAX_RECORDS} registros; no se leyó el resto"]
+                })
+                break
+            data, errors = parse_batch_record(raw)
+            if data is None:
+                summary["invalid"] += 1
+                chunk_results.append({"line": line_no, "status": "invalid", "errors": errors})
+            else:
+                key = f"hash:{payload_fingerprint(data)}"
+                previous = idempotency_store.get(key)
+                if previous is not None or key in seen_in_chunk:
+                    summary["duplicate"] += 1
+                    result = {"line": line_no, "status": "duplicate"}
+                    if previous is not None:
+                        result["submission_id"] = previous.get("submission_id")
+                    else:
+                        # Repetido dentro del mismo bloque: el id se conoce al encolar
+                        chunk_duplicates.append((result, seen_in_chunk[key]))
+                    chunk_results.append(result)
+                elif not check_rate_limit(f"batch:{client_ip}", max_requests=BATCH_RATE_LIMIT, time_window=3600):
+                    summary["rejected"] += 1
+                    summary["truncated"] = True
+                    chunk_results.append({
+                        "line": line_no, "status": "rejected",
+                        "errors": ["Rate limit de lotes excedido; no se leyó el resto"]
+                    })
+                    break
+                else:
+                    summary["accepted"] += 1
+                    result = {"line": line_no, "status": "accepted"}
+                    chunk_results.append(result)
+                    chunk_pending.append((result, data, key))
+                    seen_in_chunk[key] = result
+            
+            if len(chunk_results) >= BATCH_CHUNK_SIZE:
+                await flush_chunk()
+                seen_in_chunk.clear()
+        await flush_chunk()
+    except Exception as e:
+        results.close()
+        logger.error(f"❌ Error procesando lote: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error interno del servidor"
+        )
+    
+    results.write(json_dumps({"summary": summary}) + b"\n")
+    results.seek(0)
+    logger.info(f"✅ Lote procesado: {summary}")
+    
+    def stream_results():
+        try:
+            while True:
+                block = results.read(64 * 1024)
+                if not block:
+                    break
+                yield block
+        finally:
+            results.close()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/webhook/submit/{submission_id}")
+async def submission_status(submission_id: str):
+    """Estado de entrega de un envío encolado"""
+    submission = await asyncio.to_thread(submission_queue.get, submission_id)
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Envío no encontrado")
+    return submission
+
 # ============================================
 # STARTUP EVENT
 # ============================================
@@ -516,6 +941,27 @@ async def startup_event():
     logger.info("✅ Rate limiting activado")
     logger.info("✅ Validación de datos activada")
     logger.info("=" * 50)
+    custom_field_catalog.start()
+    rate_limiter.start_sweeper(RATE_LIMIT_SWEEP_INTERVAL)
+    
+    # Reanudar envíos que quedaron a medias en un reinicio
+    requeued = await asyncio.to_thread(submission_queue.requeue_stale)
+    if requeued:
+        logger.info(f"🔁 {requeued} envíos pendientes reencolados")
+    
+    delivery_pool.start()
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detiene tareas de fondo y cierra el pool de conexiones con GoHighLevel"""
+    await loop_monitor.stop()
+    await delivery_pool.stop()
+    await rate_limiter.stop_sweeper()
+    await custom_field_catalog.stop()
+    await close_client()
+    submission_queue.close()
+    contact_index.close()
 
 if __name__ == "__main__":
     import uvicorn
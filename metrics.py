@@ -0,0 +1,193 @@
+"""
+Métricas en formato Prometheus (texto 0.0.4) para GET /metrics
+
+Los agregados son diccionarios por proceso: registrar una muestra es una
+suma sobre una lista, sin locks (todo ocurre en el hilo del event loop y
+las operaciones sobre dict/list son atómicas con el GIL). Con varios
+workers de uvicorn cada proceso expone sus propios contadores y
+Prometheus los suma por instancia.
+"""
+import bisect
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Segundos: de respuestas locales (ms) a llamadas lentas a GHL
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self._values
+        values[labels] = values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteo por bucket (no acumulado)..., +Inf, suma]
+        self._values: Dict[tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Todas las métricas registradas en formato de exposición de Prometheus"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================
+# MÉTRICAS DEL SERVICIO
+# ============================================
+
+http_requests = Counter(
+    "webhook_http_requests_total", "Peticiones HTTP atendidas", ("path", "method", "status")
+)
+http_request_duration = Histogram(
+    "webhook_http_request_duration_seconds", "Latencia de las peticiones HTTP", ("path", "method")
+)
+ghl_requests = Counter(
+    "ghl_requests_total", "Llamadas a GoHighLevel por endpoint y resultado", ("endpoint", "status")
+)
+ghl_request_duration = Histogram(
+    "ghl_request_duration_seconds", "Latencia de cada intento contra GoHighLevel", ("endpoint",)
+)
+rate_limit_rejections = Counter(
+    "webhook_rate_limit_rejections_total", "Peticiones rechazadas por rate limiting"
+)
+validation_failures = Counter(
+    "webhook_validation_failures_total", "Errores de validación por motivo", ("reason",)
+)
+ghl_contacts = Counter(
+    "ghl_contacts_total", "Resultados de crear contacto (created | duplicate)", ("result",)
+)
+ghl_contact_resolutions_shared = Counter(
+    "ghl_contact_resolutions_shared_total",
+    "Envíos que usaron el contactId resuelto por otro envío del mismo contacto"
+)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que cuenta y mide las peticiones a las rutas indicadas
+
+    Es ASGI puro (sin BaseHTTPMiddleware) para no añadir una tarea ni copiar
+    el cuerpo de la respuesta.
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path, method = scope["path"], scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, path, method)
+            http_requests.inc(path, method, str(status or 500))
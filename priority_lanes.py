@@ -0,0 +1,170 @@
+"""
+Carriles de prioridad para la entrega de envíos
+
+Cada envío entra en un carril según su service_type: los servicios urgentes
+(carga aérea exprés, vuelos chárter) van al carril "high" y los contactos
+genéricos al "low"; el resto, al "normal". Cuando hay backlog, el
+dispatcher reparte los workers entre carriles con weighted fair queuing:
+cada carril recibe una parte del caudal proporcional a su peso, así que
+"high" se vacía primero pero "low" nunca se queda a cero.
+
+Además, un envío que lleva más de DELIVERY_LANE_MAX_WAIT segundos listo
+para entregar se toma antes que cualquier otro, sea del carril que sea
+(guardia contra inanición): la demora de un lead de baja prioridad queda
+acotada aunque el carril alto no deje de recibir envíos.
+"""
+import logging
+import os
+from typing import Dict, Iterable, List
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LANE_HIGH = "high"
+LANE_NORMAL = "normal"
+LANE_LOW = "low"
+
+
+def _csv_set(value: str) -> frozenset:
+    return frozenset(item.strip() for item in value.split(",") if item.strip())
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """
+    'high=4,normal=2,low=1' → {'high': 4.0, 'normal': 2.0, 'low': 1.0}
+
+    Los pesos no numéricos o <= 0 se ignoran (con aviso): el carril queda
+    con el peso por defecto en vez de tumbar el arranque.
+    """
+    weights = {}
+    for item in value.split(","):
+        lane, _, weight = item.partition("=")
+        lane, weight = lane.strip(), weight.strip()
+        if not lane or not weight:
+            continue
+        try:
+            parsed = float(weight)
+        except ValueError:
+            parsed = 0.0
+        if not parsed > 0 or parsed == float("inf"):
+            logger.warning(f"⚠️ Peso inválido para el carril '{lane}': {weight!r} (se usa 1)")
+            continue
+        weights[lane] = parsed
+    return weights
+
+
+DELIVERY_HIGH_PRIORITY_SERVICES = _csv_set(
+    os.getenv("DELIVERY_HIGH_PRIORITY_SERVICES", "express_air_freight,charter_flights")
+)
+DELIVERY_LOW_PRIORITY_SERVICES = _csv_set(
+    os.getenv("DELIVERY_LOW_PRIORITY_SERVICES", "general_contact,contact_form")
+)
+DELIVERY_LANE_WEIGHTS = _parse_weights(os.getenv("DELIVERY_LANE_WEIGHTS", "high=4,normal=2,low=1"))
+DELIVERY_LANE_MAX_WAIT = float(os.getenv("DELIVERY_LANE_MAX_WAIT", "300"))
+
+# Espera en cola: de segundos a la demora máxima de la guardia
+LANE_WAIT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+lane_depth = metrics.Gauge("delivery_lane_depth", "Envíos sin entregar por carril", ("lane",))
+lane_wait = metrics.Histogram(
+    "delivery_lane_wait_seconds", "Tiempo listo para entregar hasta ser tomado, por carril",
+    ("lane",), buckets=LANE_WAIT_BUCKETS
+)
+lane_promotions = metrics.Counter(
+    "delivery_lane_promotions_total", "Envíos adelantados por la guardia de inanición", ("lane",)
+)
+
+
+def lane_for(data: dict) -> str:
+    """Carril del envío según su service_type"""
+    service_type = data.get("service_type") or "general_contact"
+    if service_type in DELIVERY_HIGH_PRIORITY_SERVICES:
+        return LANE_HIGH
+    if service_type in DELIVERY_LOW_PRIORITY_SERVICES:
+        return LANE_LOW
+    return LANE_NORMAL
+
+
+class LaneScheduler:
+    """
+    Elige qué envíos listos se entregan primero
+
+    WFQ con etiquetas de tiempo virtual: cada envío tomado de un carril
+    avanza su etiqueta en 1/peso y siempre se sirve el carril cuya próxima
+    etiqueta es la menor. Un carril que estuvo vacío arranca desde el reloj
+    virtual actual, no acumula crédito por el tiempo que no tuvo trabajo.
+
+    Args:
+        weights: Peso de cada carril
+        max_wait: Espera (segundos) a partir de la cual un envío se adelanta
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, max_wait: float = DELIVERY_LANE_MAX_WAIT):
+        self.weights = dict(weights or DELIVERY_LANE_WEIGHTS)
+        for lane, weight in self.weights.items():
+            if not weight > 0:
+                raise ValueError(f"el peso del carril '{lane}' debe ser > 0 (recibido {weight!r})")
+        # Un carril sin peso configurado se atiende igual, con peso 1
+        for lane in (LANE_HIGH, LANE_NORMAL, LANE_LOW):
+            self.weights.setdefault(lane, 1.0)
+        self.max_wait = max_wait
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {lane: 0.0 for lane in self.weights}
+        self._backlogged: set = set()
+
+    @property
+    def lanes(self) -> Iterable[str]:
+        return self.weights.keys()
+
+    def _charge(self, lane: str) -> None:
+        start = self._finish[lane]
+        self._finish[lane] = start + 1.0 / self.weights.get(lane, 1.0)
+        self._virtual_time = max(self._virtual_time, start)
+
+    def _next_lane(self, heads: Dict[str, List[dict]]) -> str:
+        return min(
+            (lane for lane, items in heads.items() if items),
+            key=lambda lane: self._finish[lane] + 1.0 / self.weights.get(lane, 1.0),
+        )
+
+    def pick(self, heads: Dict[str, List[dict]], limit: int, now: float) -> List[dict]:
+        """
+        De los envíos listos más antiguos de cada carril (`heads`, cada
+        lista por orden de llegada y con 'lane' y 'ready_at') elige hasta
+        `limit` en el orden en que deben entregarse. Se llama desde
+        SubmissionQueue.claim_lanes, dentro de su transacción.
+        """
+        heads = {lane: list(items) for lane, items in heads.items() if items}
+        chosen: List[dict] = []
+
+        # Un carril que vuelve a tener trabajo arranca desde el reloj virtual
+        for lane in heads:
+            if lane not in self._backlogged:
+                self._finish[lane] = max(self._finish.get(lane, 0.0), self._virtual_time)
+        self._backlogged = set(heads)
+
+        # Guardia contra inanición: primero lo que ya esperó demasiado
+        overdue = sorted(
+            (item for items in heads.values() for item in items if now - item["ready_at"] >= self.max_wait),
+            key=lambda item: item["ready_at"],
+        )[:limit]
+        for item in overdue:
+            heads[item["lane"]].remove(item)
+            self._charge(item["lane"])
+            item["promoted"] = True
+            chosen.append(item)
+
+        while len(chosen) < limit and any(heads.values()):
+            lane = self._next_lane(heads)
+            self._charge(lane)
+            chosen.append(heads[lane].pop(0))
+        return chosen
+
+    @staticmethod
+    def observe(items: List[dict], now: float) -> None:
+        """Métricas de los envíos tomados (desde el event loop, no en to_thread)"""
+        for item in items:
+            lane_wait.observe(max(0.0, now - item["ready_at"]), item["lane"])
+            if item.get("promoted"):
+                lane_promotions.inc(item["lane"])
@@ -0,0 +1,192 @@
+"""
+Gobernador de tasa saliente hacia GoHighLevel
+
+Token bucket delante de cada llamada a GHL, compartido entre los workers de
+uvicorn mediante un archivo SQLite. La tasa se adapta sola:
+
+- lee X-RateLimit-Max / X-RateLimit-Interval-Milliseconds para conocer la
+  cuota real de la location y X-RateLimit-Remaining para no gastar más
+  tokens de los que GHL dice que quedan;
+- ante un 429 reduce la tasa a la mitad y vacía el bucket (AIMD); con
+  respuestas correctas la vuelve a subir poco a poco hasta la cuota.
+
+Las llamadas que completan un lead ya en curso (prioridad alta) pueden usar
+todo el bucket; las de prioridad normal/baja dejan una reserva para ellas.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_governor (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    ceiling REAL NOT NULL,
+    capacity REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class RateGovernor:
+    """
+    Token bucket adaptativo compartido entre procesos (SQLite)
+
+    Args:
+        path: Archivo SQLite compartido (":memory:" = solo este proceso)
+        rate: Tokens por segundo iniciales
+        capacity: Tamaño máximo del bucket (ráfaga)
+        reserve: Fracción del bucket reservada a prioridad alta
+        max_reserve: Tope de tokens reservados (el doble para prioridad baja)
+        min_rate: Tasa mínima tras reducciones por 429
+    """
+
+    def __init__(self, path: str = "ghl_governor.db", name: str = "ghl", rate: float = 8.0,
+                 capacity: float = 20.0, reserve: float = 0.25, max_reserve: float = 5.0,
+                 min_rate: float = 0.5):
+        self.name = name
+        self.reserve = reserve
+        self.max_reserve = max_reserve
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # La configuración actual manda sobre la guardada: techo y capacidad
+        # se actualizan y la tasa (que pudo bajar por 429) no queda por encima
+        # del nuevo techo
+        self._conn.execute(
+            "INSERT INTO rate_governor (name, tokens, rate, ceiling, capacity, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET "
+            "ceiling = excluded.ceiling, capacity = excluded.capacity, "
+            "rate = MIN(rate, excluded.ceiling), tokens = MIN(tokens, excluded.capacity)",
+            (name, capacity, rate, rate, capacity, time.time()),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _update(self, fn):
+        """Lee, modifica y guarda el estado del bucket en una transacción"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, rate, ceiling, capacity, updated_at, blocked_until "
+                    "FROM rate_governor WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens, rate, ceiling, capacity, updated_at, blocked_until = row
+                now = time.time()
+                tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+                state = {
+                    "tokens": tokens, "rate": rate, "ceiling": ceiling,
+                    "capacity": capacity, "blocked_until": blocked_until, "now": now,
+                }
+                result = fn(state)
+                self._conn.execute(
+                    "UPDATE rate_governor SET tokens = ?, rate = ?, ceiling = ?, capacity = ?, "
+                    "updated_at = ?, blocked_until = ? WHERE name = ?",
+                    (state["tokens"], state["rate"], state["ceiling"], state["capacity"],
+                     now, state["blocked_until"], self.name),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def try_take(self, priority: str = PRIORITY_NORMAL) -> float:
+        """
+        Intenta tomar un token; devuelve 0 si lo consiguió o los segundos a
+        esperar antes de volver a intentarlo
+        """
+        def take(state: dict) -> float:
+            if state["blocked_until"] > state["now"]:
+                return state["blocked_until"] - state["now"]
+            floor = 0.0
+            if priority != PRIORITY_HIGH:
+                floor = min(state["capacity"] * self.reserve, self.max_reserve)
+                if priority == PRIORITY_LOW:
+                    floor *= 2
+            needed = floor + 1.0
+            if state["tokens"] >= needed:
+                state["tokens"] -= 1.0
+                return 0.0
+            return (needed - state["tokens"]) / state["rate"]
+        return self._update(take)
+
+    async def acquire(self, priority: str = PRIORITY_NORMAL) -> float:
+        """Espera hasta obtener un token; devuelve el tiempo esperado"""
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self.try_take, priority)
+            if wait <= 0:
+                return waited
+            wait = min(wait, 5.0)
+            waited += wait
+            await asyncio.sleep(wait)
+
+    def observe(self, response: httpx.Response) -> None:
+        """Ajusta la tasa según la respuesta de GHL (cabeceras y 429)"""
+        headers = response.headers
+        limit = _float_header(headers, "X-RateLimit-Max")
+        interval_ms = _float_header(headers, "X-RateLimit-Interval-Milliseconds")
+        remaining = _float_header(headers, "X-RateLimit-Remaining")
+        throttled = response.status_code == 429
+        retry_after = _float_header(headers, "Retry-After") if throttled else None
+
+        def adapt(state: dict) -> None:
+            if limit and interval_ms:
+                # Margen del 10% para no rozar la cuota real
+                state["ceiling"] = 0.9 * limit / (interval_ms / 1000.0)
+                state["capacity"] = max(1.0, 0.9 * limit)
+            if remaining is not None:
+                state["tokens"] = min(state["tokens"], remaining)
+            if throttled:
+                state["rate"] = max(self.min_rate, state["rate"] / 2)
+                state["tokens"] = 0.0
+                if retry_after:
+                    state["blocked_until"] = state["now"] + retry_after
+            else:
+                state["rate"] = state["rate"] + 0.01 * state["ceiling"]
+            state["rate"] = max(self.min_rate, min(state["rate"], state["ceiling"]))
+        self._update(adapt)
+        if throttled:
+            logger.warning(f"🚦 GHL 429: tasa de salida reducida ({self.snapshot()['rate']:.2f} req/s)")
+
+    def snapshot(self) -> dict:
+        def read(state: dict) -> dict:
+            return {
+                "tokens": round(state["tokens"], 2),
+                "rate": round(state["rate"], 3),
+                "ceiling": round(state["ceiling"], 3),
+                "capacity": round(state["capacity"], 2),
+                "blocked_for": round(max(0.0, state["blocked_until"] - state["now"]), 3),
+            }
+        return self._update(read)
+
+
+def _float_header(headers: httpx.Headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,101 @@
+"""
+Rate limiter de ventana deslizante con memoria acotada
+
+Cada clave (IP) guarda solo tres enteros: inicio de la ventana actual y
+contadores de la ventana actual y la anterior. El conteo se estima como
+anterior * (fracción restante) + actual, así que cada verificación es O(1).
+El número de claves está limitado (se expulsa la menos usada) y un barrido
+periódico elimina las que llevan más de dos ventanas inactivas.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowRateLimiter:
+    """
+    Contador de ventana deslizante por clave con expulsión LRU
+    """
+
+    __slots__ = ("max_keys", "_entries", "_sweeper")
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # clave -> [window, window_start, prev_count, curr_count]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def allow(self, key: str, max_requests: int, window: int, now: Optional[int] = None) -> bool:
+        """
+        Registra una petición de `key` si está dentro del límite
+
+        Returns:
+            True si está dentro del límite, False si lo excedió
+        """
+        if now is None:
+            now = int(time.monotonic())
+        entries = self._entries
+
+        entry = entries.get(key)
+        if entry is None:
+            if len(entries) >= self.max_keys:
+                entries.popitem(last=False)
+            entries[key] = [window, now - now % window, 0, 1]
+            return max_requests >= 1
+
+        entries.move_to_end(key)
+        _, start, prev, curr = entry
+        current_start = now - now % window
+        if current_start != start:
+            # Avanzar la ventana; si pasó más de una, la anterior queda vacía
+            prev = curr if current_start - start == window else 0
+            curr = 0
+            start = current_start
+
+        elapsed = now - start
+        estimated = prev * (window - elapsed) // window + curr
+        allowed = estimated < max_requests
+        if allowed:
+            curr += 1
+        entry[0], entry[1], entry[2], entry[3] = window, start, prev, curr
+        return allowed
+
+    def sweep(self, now: Optional[int] = None) -> int:
+        """Elimina las claves inactivas durante más de dos ventanas"""
+        if now is None:
+            now = int(time.monotonic())
+        expired = [
+            key for key, (window, start, _, _) in self._entries.items()
+            if now - start >= 2 * window
+        ]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            removed = self.sweep()
+            if removed:
+                logger.info(f"🧹 Rate limiter: {removed} IPs expiradas, {len(self)} activas")
+
+    def start_sweeper(self, interval: float = 300.0) -> None:
+        """Inicia el barrido periódico en segundo plano"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
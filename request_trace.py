@@ -0,0 +1,194 @@
+"""
+Tiempos por etapa de cada envío
+
+Cada petición a /webhook/submit (y cada entrega en segundo plano) abre una
+traza en un ContextVar; el código marca sus etapas con `span("nombre")`
+y las llamadas a GHL se marcan solas en ghl_request. Al terminar:
+
+- la respuesta HTTP lleva una cabecera Server-Timing con la duración de
+  cada etapa (parse, validate, contact_create, ...);
+- si la traza supera SLOW_TRACE_THRESHOLD_MS se guarda completa (inicio
+  y duración de cada span) en un buffer circular que se consulta en
+  GET /admin/traces.
+
+Fuera de una traza, `span()` no registra nada.
+"""
+import hmac
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+
+SLOW_TRACE_THRESHOLD_MS = float(os.getenv("SLOW_TRACE_THRESHOLD_MS", "2000"))
+SLOW_TRACE_BUFFER = int(os.getenv("SLOW_TRACE_BUFFER", "100"))
+# Los endpoints /admin exigen X-Admin-Token igual a este valor (comparado con
+# hmac.compare_digest); sin ADMIN_TOKEN quedan cerrados (403)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("request_trace", default=None)
+
+
+class Trace:
+    """Spans (nombre, inicio, duración) de una petición o entrega"""
+
+    __slots__ = ("name", "attributes", "started_at", "_start", "spans", "duration")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.duration: Optional[float] = None
+
+    def add_span(self, name: str, start: float, duration: float, error: Optional[str] = None) -> None:
+        self.spans.append((name, start - self._start, duration, error))
+
+    def finish(self) -> float:
+        self.duration = time.perf_counter() - self._start
+        return self.duration
+
+    def server_timing(self) -> str:
+        """Valor de la cabecera Server-Timing (etapas repetidas se suman)"""
+        totals = {}
+        for name, _, duration, _ in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        elapsed = self.duration if self.duration is not None else time.perf_counter() - self._start
+        parts = [f"{name};dur={duration * 1000:.2f}" for name, duration in totals.items()]
+        parts.append(f"total;dur={elapsed * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0.0) * 1000, 2),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round(start * 1000, 2),
+                    "duration_ms": round(duration * 1000, 2),
+                    **({"error": error} if error else {}),
+                }
+                for name, start, duration, error in self.spans
+            ],
+        }
+
+
+class span:
+    """
+    Marca una etapa de la traza actual
+
+        with span("validate"):
+            ...
+    """
+
+    __slots__ = ("name", "_trace", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._trace = _current.get()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is not None:
+            self._trace.add_span(
+                self.name, self._start, time.perf_counter() - self._start,
+                exc_type.__name__ if exc_type else None,
+            )
+        return False
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def annotate(**attributes) -> None:
+    """Añade atributos (ej: submission_id) a la traza actual"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class trace_context:
+    """Abre una traza para el bloque y la guarda si resulta lenta"""
+
+    __slots__ = ("trace", "_token")
+
+    def __init__(self, name: str, **attributes):
+        self.trace = Trace(name, **attributes)
+
+    def __enter__(self) -> Trace:
+        self._token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.trace.attributes.setdefault("error", exc_type.__name__)
+        slow_traces.record(self.trace)
+        return False
+
+
+class SlowTraceBuffer:
+    """Últimas trazas que superaron el umbral de duración"""
+
+    def __init__(self, capacity: int = SLOW_TRACE_BUFFER, threshold_ms: float = SLOW_TRACE_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000.0
+        self._traces: deque = deque(maxlen=capacity)
+        self.recorded = 0
+
+    def record(self, trace: Trace) -> None:
+        duration = trace.duration if trace.duration is not None else trace.finish()
+        if duration >= self.threshold:
+            self._traces.append(trace)
+            self.recorded += 1
+
+    def snapshot(self, limit: Optional[int] = None) -> List[dict]:
+        traces = list(self._traces)
+        if limit:
+            traces = traces[-limit:]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+
+slow_traces = SlowTraceBuffer()
+
+
+def admin_authorized(token: Optional[str]) -> bool:
+    """Sin ADMIN_TOKEN configurado los endpoints /admin quedan cerrados"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+class TraceMiddleware:
+    """
+    Middleware ASGI: abre una traza por petición a las rutas indicadas y
+    añade Server-Timing a la respuesta
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        with trace_context(f"{scope['method']} {scope['path']}") as trace:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    trace.attributes["status"] = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            trace.finish()
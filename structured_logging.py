@@ -0,0 +1,226 @@
+"""
+Logging asíncrono, estructurado y sin PII
+
+- Los handlers del proceso solo encolan el LogRecord (QueueHandler); el
+  formateo y la escritura a stdout ocurren en un hilo aparte
+  (QueueListener), fuera del event loop.
+- Cada línea es un objeto JSON (ts, level, logger, msg y los campos pasados
+  con extra=...). Con LOG_FORMAT=text se mantiene el formato de texto.
+- Emails y teléfonos se enmascaran, tanto en campos estructurados como
+  dentro del mensaje, y los valores largos se truncan.
+- Los mensajes ruidosos llevan extra={"event": "..."} y se muestrean por
+  tipo con LOG_SAMPLE_RATES (ej: "payload_received=0.1,ghl_response=0.05").
+  WARNING y superiores nunca se descartan.
+- Si la cola se llena los registros se descartan y se cuentan, en lugar de
+  bloquear la petición.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Claves cuyo valor se enmascara siempre (comparación en minúsculas)
+SENSITIVE_KEYS = frozenset({"email", "phone", "authorization", "api_key", "token"})
+
+# Atributos estándar de LogRecord: todo lo demás vino en extra=...
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})")
+# 10-11 dígitos con separadores opcionales (305-555-1234, +1 (305) 555 1234)
+_PHONE_RE = re.compile(r"(?<![\w+])\+?(?:\d{1,2}[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\w)")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+def mask_email(value: str) -> str:
+    return _EMAIL_RE.sub(r"\1***@\2", value)
+
+
+def mask_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    return f"***{digits[-4:]}" if len(digits) >= 4 else "***"
+
+
+def redact_text(text: str) -> str:
+    """Enmascara emails y números de teléfono dentro de un texto libre"""
+    if "@" in text:
+        text = mask_email(text)
+    return _PHONE_RE.sub(lambda m: mask_phone(m.group()), text)
+
+
+def truncate(text: str, limit: int = LOG_MAX_FIELD_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}…(+{len(text) - limit} chars)"
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Copia del valor con PII enmascarada y textos largos truncados"""
+    if isinstance(value, dict):
+        if depth >= 5:
+            return "{…}"
+        result = {}
+        for key, item in value.items():
+            lowered = str(key).lower()
+            if lowered in SENSITIVE_KEYS or "email" in lowered or "phone" in lowered:
+                if lowered in {"authorization", "api_key", "token"}:
+                    result[key] = "***"
+                elif "email" in lowered:
+                    result[key] = mask_email(str(item))
+                else:
+                    result[key] = mask_phone(str(item))
+            else:
+                result[key] = redact(item, depth + 1)
+        return result
+    if isinstance(value, (list, tuple)):
+        if depth >= 5:
+            return "[…]"
+        items = [redact(item, depth + 1) for item in value[:50]]
+        if len(value) > 50:
+            items.append(f"…(+{len(value) - 50} items)")
+        return items
+    if isinstance(value, str):
+        return truncate(redact_text(value))
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(redact_text(str(value)))
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro, con PII enmascarada"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(redact_text(record.getMessage())),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = redact(value)
+        if record.exc_text:
+            entry["exc"] = truncate(record.exc_text, LOG_MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RedactingTextFormatter(logging.Formatter):
+    """Formato de texto original, con PII enmascarada"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return truncate(redact_text(super().format(record)), LOG_MAX_FIELD_CHARS * 4)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo por tipo de mensaje (atributo `event` del registro)
+
+    Los registros sin `event` o de nivel WARNING o superior pasan siempre.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._random = random.random
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None), 1.0)
+        return rate >= 1.0 or self._random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: si la cola está llena, descarta"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El formateo se hace en el hilo del listener; aquí solo se resuelve
+        # la traza de la excepción, que no se puede serializar más tarde
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """'evento=0.1,otro=0.5' → {'evento': 0.1, 'otro': 0.5}"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            try:
+                rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+            except ValueError:
+                continue
+    return rates
+
+
+def setup_logging() -> None:
+    """
+    Configura el logging del proceso (idempotente)
+
+    Sustituye a logging.basicConfig: el root logger pasa a tener un único
+    QueueHandler y un hilo que formatea y escribe en stdout.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        output.setFormatter(RedactingTextFormatter(TEXT_FORMAT))
+    else:
+        output.setFormatter(JSONFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola y detiene el hilo de escritura"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+    }
@@ -0,0 +1,368 @@
+"""
+Cola persistente de envíos de formularios (SQLite en modo WAL)
+
+/webhook/submit guarda el envío aquí y responde 202 de inmediato; la entrega
+a GoHighLevel ocurre después desde el pool de workers. Si GHL está caído los
+envíos quedan en disco y se reintentan, no se pierden.
+
+Cada envío avanza por pending → contact_created → opportunity_created → done
+y el paso completado se guarda, así que tras un fallo o un reinicio se
+reanuda desde ahí (un contacto ya creado no se vuelve a crear). Los workers
+toman envíos con un lease; si el proceso muere, el lease vence y otro
+worker lo retoma.
+
+Los envíos de un mismo contacto (contact_key) se entregan en orden: uno no
+se toma mientras haya otro anterior del mismo contacto sin terminar.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Estados de un envío
+STATUS_PENDING = "pending"
+STATUS_CONTACT_CREATED = "contact_created"
+STATUS_OPPORTUNITY_CREATED = "opportunity_created"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED)
+QUEUE_STATUSES = (
+    STATUS_PENDING, STATUS_CONTACT_CREATED, STATUS_OPPORTUNITY_CREATED, *FINAL_STATUSES
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_pending
+    ON submissions (status, next_attempt_at);
+"""
+
+# Columnas añadidas después de la primera versión del esquema
+_MIGRATIONS = {
+    "lease_until": "ALTER TABLE submissions ADD COLUMN lease_until REAL",
+    "contact_id": "ALTER TABLE submissions ADD COLUMN contact_id TEXT",
+    "opportunity_id": "ALTER TABLE submissions ADD COLUMN opportunity_id TEXT",
+    "lane": "ALTER TABLE submissions ADD COLUMN lane TEXT NOT NULL DEFAULT 'normal'",
+    "contact_key": "ALTER TABLE submissions ADD COLUMN contact_key TEXT",
+}
+
+# Índice parcial por carril: solo envíos sin terminar, así los 'done'
+# acumulados no se recorren al buscar trabajo. Las consultas que deben usarlo
+# repiten la condición con literales (SQLite no lo usa con parámetros).
+_OPEN_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_submissions_lane_open "
+    "ON submissions (lane, created_at) WHERE status NOT IN ('done', 'failed')",
+    "CREATE INDEX IF NOT EXISTS idx_submissions_contact_open "
+    "ON submissions (contact_key, created_at) WHERE status NOT IN ('done', 'failed')",
+)
+
+_ITEM_COLUMNS = (
+    "s.id, s.payload, s.status, s.attempts, s.contact_id, s.opportunity_id, "
+    "s.lane, s.contact_key, s.next_attempt_at"
+)
+
+# Orden por contacto: ningún envío anterior del mismo contacto sin terminar
+# (ni pendiente ni en curso). Los de un mismo lote comparten created_at y
+# se desempatan por rowid.
+_NO_EARLIER_OPEN = (
+    "NOT EXISTS (SELECT 1 FROM submissions e "
+    "WHERE e.contact_key = s.contact_key AND e.status NOT IN ('done', 'failed') "
+    "AND (e.created_at < s.created_at OR (e.created_at = s.created_at AND e.rowid < s.rowid)))"
+)
+
+
+class SubmissionQueue:
+    """
+    Cola de envíos respaldada por SQLite
+
+    Todas las operaciones son síncronas y cortas (una transacción); desde
+    código async se llaman con asyncio.to_thread.
+
+    Args:
+        path: Archivo SQLite
+        max_attempts: Intentos antes de marcar un envío como 'failed'
+        lane_of: Función que asigna el carril de prioridad de un envío nuevo
+        contact_key_of: Función que da la clave de contacto de un envío nuevo
+            (None = sin orden por contacto)
+    """
+
+    def __init__(self, path: str = "submissions.db", max_attempts: int = 10,
+                 lane_of: Optional[Callable[[dict], str]] = None,
+                 contact_key_of: Optional[Callable[[dict], Optional[str]]] = None):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lane_of = lane_of or (lambda data: "normal")
+        self.contact_key_of = contact_key_of or (lambda data: None)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(submissions)")}
+        for column, ddl in _MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(ddl)
+        for ddl in _OPEN_INDEXES:
+            self._conn.execute(ddl)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, data: dict) -> str:
+        """Guarda un envío nuevo y devuelve su ID"""
+        submission_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO submissions "
+                "(id, payload, status, lane, contact_key, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (submission_id, json.dumps(data, ensure_ascii=False), STATUS_PENDING,
+                 self.lane_of(data), self.contact_key_of(data), now, now, now),
+            )
+        return submission_id
+
+    def enqueue_many(self, items: List[dict]) -> List[str]:
+        """Guarda varios envíos en una sola transacción y devuelve sus IDs"""
+        now = time.time()
+        ids = [uuid.uuid4().hex for _ in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO submissions "
+                    "(id, payload, status, lane, contact_key, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (submission_id, json.dumps(data, ensure_ascii=False), STATUS_PENDING,
+                         self.lane_of(data), self.contact_key_of(data), now, now, now)
+                        for submission_id, data in zip(ids, items)
+                    ],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    @staticmethod
+    def _item(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "data": json.loads(row["payload"]),
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "contact_id": row["contact_id"],
+            "opportunity_id": row["opportunity_id"],
+            "lane": row["lane"],
+            "contact_key": row["contact_key"],
+            "ready_at": row["next_attempt_at"],
+        }
+
+    def _lease(self, rows: Iterable[sqlite3.Row], now: float, lease_seconds: float) -> None:
+        self._conn.executemany(
+            "UPDATE submissions SET lease_until = ?, updated_at = ? WHERE id = ?",
+            [(now + lease_seconds, now, row["id"]) for row in rows],
+        )
+
+    def claim(self, limit: int = 10, lease_seconds: float = 300.0) -> List[dict]:
+        """
+        Toma hasta `limit` envíos listos para entregar, reservándolos con un
+        lease de `lease_seconds`, y los devuelve
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT {_ITEM_COLUMNS} FROM submissions s "
+                    "WHERE s.status NOT IN (?, ?) AND s.next_attempt_at <= ? "
+                    "AND (s.lease_until IS NULL OR s.lease_until <= ?) "
+                    f"AND {_NO_EARLIER_OPEN} "
+                    "ORDER BY s.created_at, s.rowid LIMIT ?",
+                    (*FINAL_STATUSES, now, now, limit),
+                ).fetchall()
+                self._lease(rows, now, lease_seconds)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self._item(row) for row in rows]
+
+    def claim_lanes(self, limit: int, lease_seconds: float, scheduler) -> List[dict]:
+        """
+        Como claim, pero el orden lo decide `scheduler` (ver
+        priority_lanes.LaneScheduler) entre los `limit` envíos listos más
+        antiguos de cada carril. Lectura, elección y lease van en la misma
+        transacción.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                heads: Dict[str, List[dict]] = {}
+                rows_by_id = {}
+                for lane in scheduler.lanes:
+                    rows = self._conn.execute(
+                        f"SELECT {_ITEM_COLUMNS} FROM submissions s "
+                        "WHERE s.lane = ? AND s.status NOT IN ('done', 'failed') AND s.next_attempt_at <= ? "
+                        "AND (s.lease_until IS NULL OR s.lease_until <= ?) "
+                        f"AND {_NO_EARLIER_OPEN} "
+                        "ORDER BY s.created_at, s.rowid LIMIT ?",
+                        (lane, now, now, limit),
+                    ).fetchall()
+                    heads[lane] = [self._item(row) for row in rows]
+                    rows_by_id.update((row["id"], row) for row in rows)
+                chosen = scheduler.pick(heads, limit, now)
+                self._lease([rows_by_id[item["id"]] for item in chosen], now, lease_seconds)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return chosen
+
+    def advance(
+        self,
+        submission_id: str,
+        status: str,
+        contact_id: Optional[str] = None,
+        opportunity_id: Optional[str] = None,
+        result: Optional[dict] = None,
+    ) -> None:
+        """Persiste el paso completado; el lease se libera al llegar a 'done'"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE submissions SET status = ?, "
+                "contact_id = COALESCE(?, contact_id), "
+                "opportunity_id = COALESCE(?, opportunity_id), "
+                "result = COALESCE(?, result), "
+                "lease_until = CASE WHEN ? THEN NULL ELSE lease_until END, "
+                "last_error = NULL, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    contact_id,
+                    opportunity_id,
+                    json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                    status in FINAL_STATUSES,
+                    now,
+                    submission_id,
+                ),
+            )
+
+    def rewind(self, submission_id: str) -> None:
+        """Vuelve un envío a 'pending' descartando el contactId resuelto"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE submissions SET status = ?, contact_id = NULL, updated_at = ? "
+                "WHERE id = ? AND status NOT IN (?, ?)",
+                (STATUS_PENDING, time.time(), submission_id, *FINAL_STATUSES),
+            )
+
+    def mark_done(self, submission_id: str, result: Optional[dict] = None) -> None:
+        self.advance(submission_id, STATUS_DONE, result=result)
+
+    def mark_retry(self, submission_id: str, error: str) -> str:
+        """
+        Registra un intento fallido conservando el último paso completado;
+        reprograma con backoff exponencial o marca 'failed' si se agotaron
+        los intentos. Devuelve el nuevo estado.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts FROM submissions WHERE id = ?", (submission_id,)
+            ).fetchone()
+            if row is None:
+                return STATUS_FAILED
+            attempts = row["attempts"] + 1
+            status = STATUS_FAILED if attempts >= self.max_attempts else row["status"]
+            delay = min(600, 5 * 2 ** (attempts - 1))
+            self._conn.execute(
+                "UPDATE submissions SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, attempts, now + delay, error, now, submission_id),
+            )
+        return status
+
+    def defer(self, submission_id: str, delay: float, reason: str) -> None:
+        """Pospone un envío sin contar un intento (ej: GHL no disponible)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE submissions SET next_attempt_at = ?, lease_until = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (now + delay, reason, now, submission_id),
+            )
+
+    def requeue_stale(self) -> int:
+        """
+        Al arrancar: limpia los leases ya vencidos. Los leases vigentes se
+        respetan: otro proceso (otro worker de uvicorn o la instancia
+        anterior en un reinicio escalonado) puede estar entregándolos
+        todavía; si murió, claim los retoma cuando vencen.
+        """
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE submissions SET lease_until = NULL, updated_at = ? "
+                "WHERE lease_until IS NOT NULL AND lease_until <= ? AND status NOT IN (?, ?)",
+                (now, now, *FINAL_STATUSES),
+            )
+            return cur.rowcount
+
+    def get(self, submission_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, attempts, contact_id, opportunity_id, "
+                "created_at, updated_at, last_error, result "
+                "FROM submissions WHERE id = ?",
+                (submission_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "contact_id": row["contact_id"],
+            "opportunity_id": row["opportunity_id"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "last_error": row["last_error"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+        }
+
+    def counts(self) -> dict:
+        """Número de envíos por estado"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM submissions GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def lane_counts(self) -> dict:
+        """Envíos sin terminar por carril de prioridad"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lane, COUNT(*) AS n FROM submissions "
+                "WHERE status NOT IN ('done', 'failed') GROUP BY lane"
+            ).fetchall()
+        return {row["lane"]: row["n"] for row in rows}
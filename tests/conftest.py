@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# Los módulos de la app viven en la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main abre sus bases SQLite al importarse: que no toquen las del directorio de trabajo
+_DATA_DIR = tempfile.mkdtemp(prefix="jetcargo-tests-")
+os.environ.setdefault("SUBMISSION_QUEUE_PATH", os.path.join(_DATA_DIR, "submissions.db"))
+os.environ.setdefault("CONTACT_INDEX_PATH", os.path.join(_DATA_DIR, "contacts.db"))
+os.environ.setdefault("GHL_GOVERNOR_PATH", ":memory:")
+os.environ.setdefault("GOHIGHLEVEL_API_KEY", "test-key")
+os.environ.setdefault("GOHIGHLEVEL_LOCATION_ID", "test-location")
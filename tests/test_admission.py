@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionController, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_admits_up_to_max_inflight_then_queues():
+    async def scenario():
+        controller = AdmissionController(max_inflight=2, max_queue=1, max_wait=1.0)
+        first = await controller.acquire()
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.snapshot()["queued"] == 1
+
+        # Cola llena: rechazo inmediato
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire()
+        assert excinfo.value.reason == "queue_full"
+        assert excinfo.value.retry_after >= 1
+
+        # Al liberar, el hueco pasa al que esperaba sin cambiar inflight
+        controller.release(first)
+        await waiter
+        assert controller.inflight == 2
+        assert controller.snapshot()["queued"] == 0
+
+    run(scenario())
+
+
+def test_waiter_times_out():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=5, max_wait=0.01)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire()
+        assert excinfo.value.reason == "timeout"
+        assert controller.inflight == 1
+        assert controller.snapshot()["queued"] == 0
+
+    run(scenario())
+
+
+def test_timeout_racing_a_handoff_returns_the_slot(monkeypatch):
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=5, max_wait=1.0)
+        holder = await controller.acquire()
+
+        async def handoff_then_timeout(future, timeout):
+            # El hueco se transfiere justo cuando vence la espera
+            controller.release(holder)
+            assert future.done()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", handoff_then_timeout)
+        with pytest.raises(Overloaded):
+            await controller.acquire()
+        monkeypatch.undo()
+
+        # El hueco transferido se devolvió: no queda ocupado para siempre
+        assert controller.inflight == 0
+        await asyncio.wait_for(controller.acquire(), 0.1)
+        assert controller.inflight == 1
+
+    run(scenario())
+
+
+def test_cancel_after_handoff_returns_the_slot():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=5, max_wait=1.0)
+        holder = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        # Se transfiere el hueco y el cliente se desconecta en el mismo tick.
+        # Según la versión de Python, wait_for propaga la cancelación (y el
+        # hueco debe devolverse) o entrega el hueco (y el llamador lo libera)
+        controller.release(holder)
+        waiter.cancel()
+        result = (await asyncio.gather(waiter, return_exceptions=True))[0]
+        if not isinstance(result, asyncio.CancelledError):
+            controller.release(result)
+        assert controller.inflight == 0
+
+    run(scenario())
+
+
+def test_release_skips_cancelled_waiters():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=5, max_wait=1.0)
+        holder = await controller.acquire()
+        gone = asyncio.create_task(controller.acquire())
+        live = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+
+        controller.release(holder)
+        await asyncio.wait_for(live, 0.1)
+        assert controller.inflight == 1
+
+    run(scenario())
+
+
+def test_codel_drops_after_sustained_queueing_delay():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=10, target_delay=0.001,
+                                         interval=0.0, max_wait=1.0)
+        holder = await controller.acquire()
+        for _ in range(2):
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0.01)
+            controller.release(holder)
+            holder = await waiter
+        assert controller.dropping
+
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire()
+        assert excinfo.value.reason == "codel"
+
+    run(scenario())
@@ -0,0 +1,101 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from rate_limiter import SlidingWindowRateLimiter
+
+
+class _Body:
+    """Request mínimo para iter_ndjson_lines: solo stream()"""
+
+    def __init__(self, *chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _lines(*chunks):
+    async def collect():
+        return [item async for item in main.iter_ndjson_lines(_Body(*chunks))]
+    return asyncio.run(collect())
+
+
+def _form(email):
+    return {"name": "Ana Pérez", "email": email, "phone": "3055551234", "service_type": "trucking_services"}
+
+
+def _ndjson(*records):
+    return b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_TOKEN", "secret")
+    monkeypatch.setattr(main, "rate_limiter", SlidingWindowRateLimiter())
+    return TestClient(main.app)
+
+
+def _post(client, body, token="secret"):
+    response = client.post("/webhook/submit/batch", content=body, headers={"X-Batch-Token": token})
+    results = [orjson.loads(line) for line in response.content.splitlines()] if response.status_code == 200 else []
+    return response, results
+
+
+def test_iter_ndjson_lines_joins_lines_split_across_chunks():
+    assert _lines(b'{"a":', b'1}\n{"b"', b':2}\n', b'{"c":3}') == [
+        (1, b'{"a":1}'), (2, b'{"b":2}'), (3, b'{"c":3}')
+    ]
+
+
+def test_iter_ndjson_lines_drops_oversized_lines(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_LINE_BYTES", 8)
+    assert _lines(b'{"a":1}\n', b"x" * 6, b"x" * 6 + b"\n", b'{"b":2}\n') == [
+        (1, b'{"a":1}'), (2, None), (3, b'{"b":2}')
+    ]
+
+
+def test_parse_batch_record_reports_each_kind_of_error():
+    assert main.parse_batch_record(None)[1] == [f"Línea mayor a {main.BATCH_MAX_LINE_BYTES} bytes"]
+    assert main.parse_batch_record(b"{no json")[1] == ["JSON inválido"]
+    assert main.parse_batch_record(b"[1, 2]")[1] == ["Se esperaba un objeto JSON"]
+    assert main.parse_batch_record(b'{"name": 5, "email": ["a@x.com"], "phone": {"n": 1}}')[1] == [
+        "Nombre inválido o faltante", "Formato de email inválido", "Formato de teléfono inválido (mínimo 10 dígitos)"
+    ]
+
+
+def test_parse_batch_record_accepts_a_valid_form():
+    data, errors = main.parse_batch_record(orjson.dumps(_form("parse@x.com")))
+    assert errors == []
+    assert data["email"] == "parse@x.com"
+
+
+def test_batch_requires_token(client, monkeypatch):
+    body = _ndjson(_form("token@x.com"))
+    assert _post(client, body, token="wrong")[0].status_code == 403
+    monkeypatch.setattr(main, "BATCH_TOKEN", None)
+    assert _post(client, body, token="")[0].status_code == 403
+
+
+def test_batch_stops_reading_past_max_records(client, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_RECORDS", 2)
+    response, results = _post(client, _ndjson(*(_form(f"cap{i}@x.com") for i in range(4))))
+
+    assert response.status_code == 200
+    assert [r.get("status") for r in results[:-1]] == ["accepted", "accepted", "rejected"]
+    assert results[-1]["summary"] == {"accepted": 2, "duplicate": 0, "invalid": 0, "rejected": 1, "truncated": True}
+
+
+def test_batch_charges_rate_limit_per_record(client, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_RATE_LIMIT", 2)
+    _, first = _post(client, _ndjson(_form("rl0@x.com"), {"email": "bad"}, _form("rl1@x.com"), _form("rl2@x.com")))
+    _, second = _post(client, _ndjson(_form("rl3@x.com")))
+
+    # Los inválidos no consumen cupo; al agotarlo se deja de leer
+    assert [r.get("status") for r in first[:-1]] == ["accepted", "invalid", "accepted", "rejected"]
+    assert first[-1]["summary"]["truncated"] is True
+    assert [r.get("status") for r in second[:-1]] == ["rejected"]
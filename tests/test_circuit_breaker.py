@@ -0,0 +1,89 @@
+import pytest
+
+from circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _breaker(**overrides):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0,
+                   slow_call_rate=0.8, reset_timeout=30.0, half_open_calls=2)
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def _call(breaker, failed=False, latency=0.01):
+    breaker.before_call()
+    breaker.record(failed, latency)
+
+
+def _expire(breaker):
+    # Simula que pasó reset_timeout desde la apertura
+    breaker._opened_at -= breaker.reset_timeout
+
+
+def test_stays_closed_until_min_calls():
+    breaker = _breaker()
+    for _ in range(3):
+        _call(breaker, failed=True)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    breaker = _breaker()
+    for failed in (False, True, False, True):
+        _call(breaker, failed=failed)
+
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert 0 < exc.value.retry_in <= 30
+    assert breaker.transitions[-1]["reason"] == "failure rate 2/4"
+
+
+def test_opens_on_slow_call_rate():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, latency=2.0)
+    assert breaker.state == STATE_OPEN
+    assert breaker.transitions[-1]["reason"] == "slow call rate 4/4"
+
+
+def test_half_open_limits_probes_and_closes_after_successes():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, failed=True)
+    _expire(breaker)
+
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(False, 0.01)
+    breaker.record(False, 0.01)
+    assert breaker.state == STATE_CLOSED
+    assert [t["to"] for t in breaker.transitions] == [STATE_OPEN, STATE_HALF_OPEN, STATE_CLOSED]
+
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, failed=True)
+    _expire(breaker)
+
+    _call(breaker, failed=True)
+    assert breaker.state == STATE_OPEN
+    assert breaker.transitions[-1]["reason"] == "probe failed"
+    assert breaker.retry_in() > 0
+
+
+def test_cancelled_probe_frees_its_slot():
+    breaker = _breaker(half_open_calls=1)
+    for _ in range(4):
+        _call(breaker, failed=True)
+    _expire(breaker)
+
+    breaker.before_call()
+    breaker.cancel_call()
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
@@ -0,0 +1,41 @@
+import pytest
+
+from contact_index import ContactIndex, contact_identities, normalize_phone
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = ContactIndex(str(tmp_path / "contacts.db"))
+    yield idx
+    idx.close()
+
+
+def test_identities_are_normalized_email_first():
+    assert contact_identities(" Ana@X.com ", "(305) 555-1234") == ["email:ana@x.com", "phone:13055551234"]
+    assert contact_identities("", "123") == []
+    assert normalize_phone("+1 305 555 1234") == normalize_phone("305.555.1234")
+
+
+def test_lookup_by_normalized_email(index):
+    index.remember("c1", email="ana@x.com", phone="3055551234")
+    assert index.lookup(email="ANA@x.com ") == "c1"
+    assert index.lookup(email="ana@x.com", phone="3050000000") == "c1"
+
+
+def test_phone_only_submission_matches_by_phone(index):
+    index.remember("c1", email="ana@x.com", phone="3055551234")
+    assert index.lookup(phone="+1 (305) 555-1234") == "c1"
+
+
+def test_shared_phone_with_other_email_does_not_merge(index):
+    index.remember("c1", email="ana@x.com", phone="3055551234")
+    assert index.lookup(email="luis@x.com", phone="3055551234") is None
+
+
+def test_invalidate_drops_every_identity_of_the_contact(index):
+    index.remember("c1", email="ana@x.com", phone="3055551234")
+    index.remember("c2", email="luis@x.com")
+    assert index.invalidate("c1") == 2
+    assert index.lookup(email="ana@x.com") is None
+    assert index.lookup(phone="3055551234") is None
+    assert len(index) == 1
@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+import pytest
+
+import custom_fields
+from circuit_breaker import CircuitOpenError
+from custom_fields import CustomFieldCatalog
+
+_FIELDS = {"customFields": [{"id": "cf1", "name": "Service Type", "fieldKey": "contact.service_type"}]}
+
+
+@pytest.fixture
+def ghl(monkeypatch):
+    """Respuestas de GET customFields, una por llamada (excepciones se lanzan)"""
+    responses = []
+    calls = []
+
+    async def fake_request(method, path, **kwargs):
+        calls.append(path)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(custom_fields, "ghl_request", fake_request)
+    return responses, calls
+
+
+def test_get_id_by_name_and_key(ghl):
+    responses, calls = ghl
+    responses.append(httpx.Response(200, json=_FIELDS))
+    catalog = CustomFieldCatalog("loc")
+
+    async def lookups():
+        return [await catalog.get_id(name) for name in ("service type", "service_type", "other")]
+
+    assert asyncio.run(lookups()) == ["cf1", "cf1", None]
+    assert len(calls) == 1
+
+
+def test_failed_load_backs_off(ghl):
+    responses, calls = ghl
+    responses.extend([httpx.Response(500, text="boom"), httpx.Response(200, json=_FIELDS)])
+    catalog = CustomFieldCatalog("loc", failure_backoff=30)
+
+    async def scenario():
+        first = [await catalog.get_id("service_type") for _ in range(3)]
+        catalog._failed_at -= 30
+        return first, await catalog.get_id("service_type")
+
+    first, after_backoff = asyncio.run(scenario())
+    assert first == [None, None, None]
+    assert after_backoff == "cf1"
+    assert len(calls) == 2
+
+
+def test_circuit_open_propagates_without_backoff(ghl):
+    responses, calls = ghl
+    responses.extend([CircuitOpenError(5.0), httpx.Response(200, json=_FIELDS)])
+    catalog = CustomFieldCatalog("loc")
+
+    async def scenario():
+        with pytest.raises(CircuitOpenError):
+            await catalog.get_id("service_type")
+        return await catalog.get_id("service_type")
+
+    assert asyncio.run(scenario()) == "cf1"
+    assert not catalog.in_backoff
+
+
+def test_stale_refresh_keeps_previous_copy_when_circuit_open(ghl):
+    responses, calls = ghl
+    responses.extend([httpx.Response(200, json=_FIELDS), CircuitOpenError(5.0)])
+    catalog = CustomFieldCatalog("loc")
+
+    async def scenario():
+        await catalog.get_id("service_type")
+        await catalog.refresh()
+        return await catalog.get_id("service_type")
+
+    assert asyncio.run(scenario()) == "cf1"
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import field_labels
+import form_layouts
+from field_labels import FIELD_LABELS, key_traits, label_for_key
+from form_layouts import compile_plan, plan_for
+
+
+def legacy_label(key: str) -> str:
+    """Recorrido original de webhook_server.create_ghl_contact"""
+    for field_key, field_label in FIELD_LABELS.items():
+        if field_key in key.lower():
+            return field_label
+    return key.replace("_", " ").replace("-", " ").replace("dmform", "Campo").title()
+
+
+def _vocabulary(n: int, seed: int = 1234) -> list:
+    rng = random.Random(seed)
+    words = list(FIELD_LABELS) + ["name", "notes", "destino", "Origin", "CARGO", "incoterm", "LB", "hubcap"]
+    keys = []
+    for _ in range(n):
+        if rng.random() < 0.3:
+            keys.append(f"dmform-{rng.randint(0, 40)}")
+        else:
+            parts = rng.sample(words, rng.randint(1, 3))
+            keys.append(rng.choice(["_", "-", ""]).join(parts))
+    return keys
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    field_labels.clear_caches()
+    form_layouts._cached_plan.cache_clear()
+
+
+@pytest.mark.parametrize("key", [
+    "destination_origin", "origin_destination", "Package-Weight", "kilos", "pallet_lb",
+    "dmform-3", "special_handling", "hub_consolidation", "notes", "",
+])
+def test_label_matches_legacy_scan(key):
+    assert label_for_key(key) == legacy_label(key)
+
+
+def test_label_matches_legacy_scan_on_generated_names():
+    mismatches = [key for key in _vocabulary(5000) if label_for_key(key) != legacy_label(key)]
+    assert mismatches == []
+
+
+def test_long_keys_are_not_cached():
+    long_key = "x" * (field_labels.LABEL_CACHE_MAX_KEY_LEN + 1) + "_weight"
+    assert label_for_key(long_key) == "Peso"
+    assert key_traits(long_key) == (False, False, False, True)
+    assert field_labels._cached_label.cache_info().currsize == 0
+    assert field_labels._cached_traits.cache_info().currsize == 0
+
+    label_for_key("weight")
+    assert field_labels._cached_label.cache_info().currsize == 1
+
+
+def test_large_layouts_are_not_cached():
+    big = {"name": "Ana", "y" * form_layouts.PLAN_CACHE_MAX_LAYOUT_CHARS: "1", "origin_city": "MIA"}
+    plan = plan_for(big)
+    assert plan == compile_plan(tuple(big), None)
+    assert form_layouts._cached_plan.cache_info().currsize == 0
+
+    plan_for({"name": "Ana", "origin_city": "MIA"})
+    assert form_layouts._cached_plan.cache_info().currsize == 1
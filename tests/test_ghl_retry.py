@@ -0,0 +1,80 @@
+import httpx
+import pytest
+
+from ghl_retry import RetryBudget, RetryPolicy, is_retryable, parse_retry_after
+
+
+def _response(status, **headers):
+    return httpx.Response(status, headers=headers)
+
+
+@pytest.mark.parametrize("status", [408, 429, 500, 502, 503, 504])
+def test_get_retries_transient_statuses(status):
+    assert is_retryable("GET", _response(status))
+
+
+@pytest.mark.parametrize("status", [200, 400, 401, 404, 422])
+def test_permanent_statuses_are_not_retried(status):
+    assert not is_retryable("GET", _response(status))
+    assert not is_retryable("POST", _response(status))
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_does_not_retry_gateway_errors(status):
+    # GHL pudo haber creado el contacto: reintentar lo duplicaría
+    assert not is_retryable("POST", _response(status))
+
+
+def test_post_retries_429_and_503_only_with_retry_after():
+    assert is_retryable("POST", _response(429))
+    assert is_retryable("POST", _response(503, **{"Retry-After": "2"}))
+    assert not is_retryable("POST", _response(503))
+
+
+def test_transport_errors():
+    request = httpx.Request("POST", "http://ghl/contacts/")
+    # No llegó a enviarse: siempre se puede reintentar
+    assert is_retryable("POST", error=httpx.ConnectError("refused", request=request))
+    # Pudo llegar a GHL: solo métodos idempotentes
+    assert not is_retryable("POST", error=httpx.ReadTimeout("slow", request=request))
+    assert is_retryable("GET", error=httpx.ReadTimeout("slow", request=request))
+    assert not is_retryable("GET", error=ValueError("bug"))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(_response(429, **{"Retry-After": "1.5"})) == 1.5
+    assert parse_retry_after(_response(429, **{"Retry-After": "soon"})) is None
+    assert parse_retry_after(_response(429)) is None
+    assert parse_retry_after(None) is None
+
+
+def test_policy_honours_retry_after_up_to_its_limit():
+    policy = RetryPolicy(max_retry_after=30)
+    assert policy.delay(1, _response(429, **{"Retry-After": "3"})) == 3.0
+    assert policy.delay(1, _response(429, **{"Retry-After": "60"})) is None
+    assert 0 <= policy.delay(10) <= policy.max_delay
+
+
+def test_budget_is_bounded_by_max_tokens():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2)
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_budget_earns_ratio_per_request():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2)
+    budget.try_acquire(), budget.try_acquire()
+
+    budget.record_request()
+    assert not budget.try_acquire()
+    budget.record_request()
+    assert budget.try_acquire()
+
+
+def test_budget_refills_slowly_without_traffic():
+    budget = RetryBudget(ratio=0.0, min_per_second=1.0, max_tokens=1)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    budget._last -= 1.0
+    assert budget.try_acquire()
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from idempotency import IdempotencyStore, payload_fingerprint
+from rate_limiter import SlidingWindowRateLimiter
+
+
+def _form(email="ana@x.com", **extra):
+    return {"name": "Ana Pérez", "email": email, "phone": "305-555-1234", "service_type": "trucking_services", **extra}
+
+
+def test_fingerprint_ignores_volatile_fields_and_formatting():
+    first = _form(timestamp="2024-01-01T00:00:00", user_agent="A")
+    second = _form(email="ANA@x.com", phone="(305) 555 1234", timestamp="2024-02-02", user_agent="B")
+    assert payload_fingerprint(first) == payload_fingerprint(second)
+    assert payload_fingerprint(_form()) != payload_fingerprint(_form(service_type="car_auction"))
+
+
+def test_run_is_single_flight_for_concurrent_callers():
+    store = IdempotencyStore()
+    calls = []
+
+    async def producer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"submission_id": "s1"}
+
+    async def scenario():
+        return await asyncio.gather(*(store.run("k", 60, producer) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results] == [False, True, True, True, True]
+    assert all(result == {"submission_id": "s1"} for result, _ in results)
+
+
+def test_run_does_not_cache_failures():
+    store = IdempotencyStore()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await store.run("k", 60, flaky)
+        return await store.run("k", 60, flaky)
+
+    assert asyncio.run(scenario()) == ("ok", False)
+    assert not store._inflight
+
+
+def test_results_expire_and_are_bounded():
+    store = IdempotencyStore(max_entries=2)
+    store.put("expired", "x", ttl=0)
+    assert store.get("expired") is None
+    for key in ("a", "b", "c"):
+        store.put(key, key, ttl=60)
+    assert store.get("a") is None
+    assert store.seen("c")
+    store.forget("c")
+    assert not store.seen("c")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "idempotency_store", IdempotencyStore())
+    monkeypatch.setattr(main, "rate_limiter", SlidingWindowRateLimiter())
+    return TestClient(main.app)
+
+
+def test_reused_idempotency_key_with_other_body_is_rejected(client):
+    headers = {"Idempotency-Key": "form-123"}
+    first = client.post("/webhook/submit", json=_form("key@x.com"), headers=headers)
+    replay = client.post("/webhook/submit", json=_form("key@x.com"), headers=headers)
+    other = client.post("/webhook/submit", json=_form("other@x.com"), headers=headers)
+
+    assert first.status_code == 202
+    assert replay.status_code == 202
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["submission_id"] == first.json()["submission_id"]
+    assert other.status_code == 422
+
+
+def test_resubmissions_do_not_spend_rate_limit(client):
+    for _ in range(8):
+        assert client.post("/webhook/submit", json=_form("same@x.com")).status_code == 202
+    statuses = [client.post("/webhook/submit", json=_form(f"new{i}@x.com")).status_code for i in range(5)]
+    assert statuses == [202, 202, 202, 202, 429]
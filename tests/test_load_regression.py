@@ -0,0 +1,33 @@
+"""
+Gate de rendimiento contra las baselines de benchmarks/baselines (opt-in)
+
+Levanta cada app con uvicorn y el GHL simulado, así que tarda minutos y
+solo corre con LOAD_TEST=1:
+
+    LOAD_TEST=1 python -m pytest -q tests/test_load_regression.py
+
+Las baselines dependen de la máquina: tras cambiar de máquina hay que
+regenerarlas con benchmarks/load_test.py --save-baseline.
+"""
+import glob
+import json
+import os
+
+import pytest
+
+from benchmarks.load_test import BASELINE_DIR, args_for_config, compare, parse_args, run_load_test
+
+pytestmark = pytest.mark.skipif(os.getenv("LOAD_TEST") != "1", reason="prueba de carga: LOAD_TEST=1")
+
+TOLERANCE = float(os.getenv("LOAD_TEST_TOLERANCE", "0.2"))
+BASELINES = sorted(glob.glob(os.path.join(BASELINE_DIR, "*.json")))
+
+
+@pytest.mark.parametrize("baseline_path", BASELINES, ids=lambda path: os.path.basename(path)[:-5])
+def test_no_regression_against_baseline(baseline_path):
+    with open(baseline_path) as source:
+        baseline = json.load(source)
+    result = run_load_test(parse_args(args_for_config(baseline["config"]) + ["--log-level", "WARNING"]))
+
+    assert result["config"] == baseline["config"]
+    assert compare(result, baseline, TOLERANCE) == []
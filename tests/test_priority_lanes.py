@@ -0,0 +1,83 @@
+from collections import Counter
+
+import pytest
+
+from priority_lanes import LANE_HIGH, LANE_LOW, LANE_NORMAL, LaneScheduler, _parse_weights, lane_for
+
+
+def _heads(now, per_lane=50, ready_at=None):
+    return {
+        lane: [{"id": f"{lane}-{i}", "lane": lane, "ready_at": now if ready_at is None else ready_at}
+               for i in range(per_lane)]
+        for lane in (LANE_HIGH, LANE_NORMAL, LANE_LOW)
+    }
+
+
+def test_lane_for_uses_service_type():
+    assert lane_for({"service_type": "express_air_freight"}) == LANE_HIGH
+    assert lane_for({"service_type": "contact_form"}) == LANE_LOW
+    assert lane_for({}) == LANE_LOW
+    assert lane_for({"service_type": "trucking_services"}) == LANE_NORMAL
+
+
+def test_pick_shares_follow_weights():
+    scheduler = LaneScheduler(weights={LANE_HIGH: 4, LANE_NORMAL: 2, LANE_LOW: 1}, max_wait=3600)
+    chosen = scheduler.pick(_heads(now=1000.0), limit=35, now=1000.0)
+    shares = Counter(item["lane"] for item in chosen)
+    assert shares == {LANE_HIGH: 20, LANE_NORMAL: 10, LANE_LOW: 5}
+
+
+def test_pick_shares_hold_across_calls():
+    scheduler = LaneScheduler(weights={LANE_HIGH: 4, LANE_NORMAL: 2, LANE_LOW: 1}, max_wait=3600)
+    shares = Counter()
+    for _ in range(7):
+        shares.update(item["lane"] for item in scheduler.pick(_heads(now=1000.0), limit=4, now=1000.0))
+    assert shares == {LANE_HIGH: 16, LANE_NORMAL: 8, LANE_LOW: 4}
+
+
+def test_pick_keeps_arrival_order_within_lane():
+    scheduler = LaneScheduler(max_wait=3600)
+    chosen = scheduler.pick(_heads(now=1000.0), limit=30, now=1000.0)
+    high = [item["id"] for item in chosen if item["lane"] == LANE_HIGH]
+    assert high == [f"high-{i}" for i in range(len(high))]
+
+
+def test_overdue_items_are_promoted_first():
+    scheduler = LaneScheduler(weights={LANE_HIGH: 100, LANE_NORMAL: 1, LANE_LOW: 0.01}, max_wait=60)
+    heads = _heads(now=1000.0)
+    heads[LANE_LOW][0]["ready_at"] = 900.0
+    chosen = scheduler.pick(heads, limit=3, now=1000.0)
+    assert chosen[0]["id"] == "low-0"
+    assert chosen[0]["promoted"] is True
+    assert all(item["lane"] == LANE_HIGH for item in chosen[1:])
+
+
+def test_pick_respects_limit_and_empty_lanes():
+    scheduler = LaneScheduler()
+    assert scheduler.pick({LANE_HIGH: [], LANE_LOW: []}, limit=4, now=0.0) == []
+    heads = {LANE_LOW: [{"id": "a", "lane": LANE_LOW, "ready_at": 0.0}]}
+    assert [item["id"] for item in scheduler.pick(heads, limit=4, now=0.0)] == ["a"]
+
+
+def test_idle_lane_does_not_bank_credit():
+    scheduler = LaneScheduler(weights={LANE_HIGH: 1, LANE_NORMAL: 1, LANE_LOW: 1}, max_wait=3600)
+    # Solo "high" tiene trabajo durante un rato
+    for _ in range(10):
+        scheduler.pick({LANE_HIGH: _heads(now=0.0)[LANE_HIGH]}, limit=4, now=0.0)
+    # Al volver "low" se reparte a partes iguales, no se lleva las 40 de golpe
+    chosen = scheduler.pick(
+        {LANE_HIGH: _heads(now=0.0)[LANE_HIGH], LANE_LOW: _heads(now=0.0)[LANE_LOW]}, limit=10, now=0.0
+    )
+    assert Counter(item["lane"] for item in chosen) == {LANE_HIGH: 5, LANE_LOW: 5}
+
+
+@pytest.mark.parametrize("weight", [0, -1, float("nan")])
+def test_scheduler_rejects_non_positive_weights(weight):
+    with pytest.raises(ValueError):
+        LaneScheduler(weights={LANE_HIGH: weight})
+
+
+def test_parse_weights_skips_invalid_entries():
+    assert _parse_weights("high=4,normal=0,low=abc,extra=-2") == {"high": 4.0}
+    scheduler = LaneScheduler(weights=_parse_weights("high=4,normal=0"))
+    assert scheduler.weights[LANE_NORMAL] == 1.0
@@ -0,0 +1,51 @@
+from rate_limiter import SlidingWindowRateLimiter
+
+
+def test_allows_up_to_limit_then_rejects():
+    limiter = SlidingWindowRateLimiter()
+    assert [limiter.allow("1.1.1.1", 3, 60, now=0) for _ in range(4)] == [True, True, True, False]
+    # Otra clave tiene su propio cupo
+    assert limiter.allow("2.2.2.2", 3, 60, now=0)
+
+
+def test_previous_window_weighs_by_remaining_fraction():
+    limiter = SlidingWindowRateLimiter()
+    for _ in range(4):
+        limiter.allow("ip", 4, 60, now=0)
+
+    # A mitad de la ventana siguiente la anterior cuenta la mitad: 2 de 4
+    assert limiter.allow("ip", 4, 60, now=90)
+    assert limiter.allow("ip", 4, 60, now=90)
+    assert not limiter.allow("ip", 4, 60, now=90)
+
+
+def test_window_resets_after_two_windows_idle():
+    limiter = SlidingWindowRateLimiter()
+    for _ in range(4):
+        limiter.allow("ip", 4, 60, now=0)
+    assert [limiter.allow("ip", 4, 60, now=120) for _ in range(5)] == [True] * 4 + [False]
+
+
+def test_rejected_requests_do_not_count():
+    limiter = SlidingWindowRateLimiter()
+    for _ in range(10):
+        limiter.allow("ip", 2, 60, now=0)
+    assert limiter._entries["ip"][3] == 2
+
+
+def test_evicts_least_recently_used_key():
+    limiter = SlidingWindowRateLimiter(max_keys=2)
+    limiter.allow("a", 5, 60, now=0)
+    limiter.allow("b", 5, 60, now=0)
+    limiter.allow("a", 5, 60, now=1)
+    limiter.allow("c", 5, 60, now=1)
+    assert set(limiter._entries) == {"a", "c"}
+
+
+def test_sweep_removes_idle_keys():
+    limiter = SlidingWindowRateLimiter()
+    limiter.allow("old", 5, 60, now=0)
+    limiter.allow("new", 5, 60, now=100)
+    assert limiter.sweep(now=130) == 1
+    assert set(limiter._entries) == {"new"}
+    assert len(limiter) == 1
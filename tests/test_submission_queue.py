@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from contact_shards import submission_contact_key
+from priority_lanes import LANE_HIGH, LANE_LOW, LaneScheduler, lane_for
+from submission_queue import STATUS_CONTACT_CREATED, SubmissionQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = SubmissionQueue(str(tmp_path / "submissions.db"), lane_of=lane_for,
+                        contact_key_of=submission_contact_key)
+    yield q
+    q.close()
+
+
+def _form(email, service_type="trucking_services", **extra):
+    return {"name": "Ana", "email": email, "phone": "3055551234", "service_type": service_type, **extra}
+
+
+def test_claim_lanes_serves_high_lane_first(queue):
+    queue.enqueue_many([_form(f"low{i}@x.com", "contact_form") for i in range(5)])
+    queue.enqueue_many([_form(f"high{i}@x.com", "express_air_freight") for i in range(5)])
+    scheduler = LaneScheduler(weights={LANE_HIGH: 4, LANE_LOW: 1}, max_wait=3600)
+
+    lanes = [item["lane"] for item in queue.claim_lanes(5, 300, scheduler)]
+
+    assert lanes.count(LANE_HIGH) == 4
+    assert lanes.count(LANE_LOW) == 1
+
+
+def test_claim_lanes_leases_what_it_returns(queue):
+    queue.enqueue_many([_form(f"p{i}@x.com") for i in range(3)])
+    scheduler = LaneScheduler()
+    first = queue.claim_lanes(2, 300, scheduler)
+    second = queue.claim_lanes(10, 300, scheduler)
+    assert len(first) == 2
+    assert {item["id"] for item in second}.isdisjoint(item["id"] for item in first)
+    assert queue.claim_lanes(10, 300, scheduler) == []
+
+
+def test_same_contact_is_never_claimed_twice_at_once(queue):
+    # Mismo contacto (email normalizado) en el mismo lote y en otro carril
+    first_id, second_id = queue.enqueue_many([
+        _form("ana@x.com", "contact_form", n=1),
+        _form(" ANA@x.com", "express_air_freight", n=2),
+    ])
+    other_id = queue.enqueue(_form("otro@x.com"))
+    scheduler = LaneScheduler()
+
+    claimed = {item["id"] for item in queue.claim_lanes(10, 300, scheduler)}
+    assert claimed == {first_id, other_id}
+
+    # Mientras el primero sigue en curso el segundo no se entrega...
+    queue.advance(first_id, STATUS_CONTACT_CREATED, contact_id="c1")
+    assert queue.claim_lanes(10, 300, scheduler) == []
+
+    # ...ni mientras espera su reintento
+    queue.mark_retry(first_id, "boom")
+    assert queue.claim(10) == []
+
+    queue.mark_done(first_id)
+    assert [item["id"] for item in queue.claim(10)] == [second_id]
+
+
+def test_failed_submission_unblocks_the_contact(queue):
+    queue.max_attempts = 1
+    first_id, second_id = queue.enqueue_many([_form("ana@x.com", n=1), _form("ana@x.com", n=2)])
+    assert [item["id"] for item in queue.claim(10)] == [first_id]
+    queue.mark_retry(first_id, "boom")
+    assert [item["id"] for item in queue.claim(10)] == [second_id]
+
+
+def test_submissions_without_contact_key_are_not_serialized(tmp_path):
+    q = SubmissionQueue(str(tmp_path / "plain.db"))
+    q.enqueue_many([{"n": 1}, {"n": 2}])
+    assert len(q.claim(10)) == 2
+    q.close()
+
+
+def test_requeue_stale_keeps_live_leases(queue):
+    live_id, expired_id = queue.enqueue_many([_form("a@x.com"), _form("b@x.com")])
+    queue.claim(10, lease_seconds=300)
+    queue._conn.execute(
+        "UPDATE submissions SET lease_until = ? WHERE id = ?", (time.time() - 1, expired_id)
+    )
+    assert queue.requeue_stale() == 1
+    assert [item["id"] for item in queue.claim(10)] == [expired_id]
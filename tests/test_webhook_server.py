@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import webhook_server
+from circuit_breaker import CircuitOpenError
+
+
+@pytest.fixture
+def client():
+    return TestClient(webhook_server.app)
+
+
+@pytest.mark.parametrize("body", [b"[1]", b'"abc"', b"42"])
+def test_submit_rejects_non_object_bodies(client, body):
+    response = client.post("/webhook/submit", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert response.json() == {"status": "error", "message": "Expected a JSON object"}
+
+
+def test_health_reports_breaker_state(client):
+    body = client.get("/health").json()
+    assert body["ghl_circuit_breaker"]["name"] == "ghl"
+    assert body["status"] == ("healthy" if body["ghl_circuit_breaker"]["state"] == "closed" else "degraded")
+
+
+def test_open_circuit_returns_503_with_retry_after(client, monkeypatch):
+    async def circuit_open(data):
+        raise CircuitOpenError(12.3)
+
+    monkeypatch.setattr(webhook_server, "create_ghl_contact", circuit_open)
+    response = client.post("/webhook/submit", json={"email": "breaker@x.com", "name": "Ana"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "13"
+    assert "circuit" not in response.text
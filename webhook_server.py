@@ -1,21 +1,36 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-import requests
+from fastapi.responses import FileResponse, Response
 import logging
+import math
 import os
 from datetime import datetime
 import uuid
 import pytz
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from ghl_client import ghl_request, close_client, breaker
+from circuit_breaker import CircuitOpenError
+from form_layouts import plan_for, KIND_DESTINATION, KIND_ORIGIN, KIND_SHIPPING
+from structured_logging import setup_logging
+import metrics
+from metrics import MetricsMiddleware
+from loop_monitor import loop_monitor
+from admission import AdmissionController, AdmissionMiddleware
+from contact_shards import ContactLocks, submission_contact_key
+from idempotency import IdempotencyStore, payload_fingerprint
+from request_trace import TraceMiddleware, span, slow_traces, admin_authorized
+from json_body import BodyError, FastJSONResponse as JSONResponse, read_json_body
+
+# Configuración de logging (JSON asíncrono, con PII enmascarada)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Jet Cargo → GoHighLevel Integration")
+app = FastAPI(title="Jet Cargo → GoHighLevel Integration", default_response_class=JSONResponse)
+
+# Control de admisión: 503 + Retry-After cuando hay demasiados envíos en curso
+# (va por dentro de CORS para que el 503 llegue al navegador con sus cabeceras)
+submit_admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=submit_admission, paths=["/webhook/submit"])
 
 # CORS - permitir TODOS los orígenes
 app.add_middleware(
@@ -26,10 +41,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Conteo y latencia de /webhook/submit (GET /metrics)
+app.add_middleware(MetricsMiddleware, paths=["/webhook/submit"])
+# Server-Timing por etapa y trazas de peticiones lentas (GET /admin/traces)
+app.add_middleware(TraceMiddleware, paths=["/webhook/submit"])
+
 # Configuración de GoHighLevel
 GHL_API_KEY = os.getenv("GOHIGHLEVEL_API_KEY")
 GHL_LOCATION_ID = os.getenv("GOHIGHLEVEL_LOCATION_ID")
-GHL_API_BASE = "https://services.leadconnectorhq.com"
 
 # Mapeo de servicios a pipelines (IDs reales de GoHighLevel)
 SERVICE_TO_PIPELINE = {
@@ -55,7 +74,14 @@ def get_pipeline_id(service_type: str):
     pipeline_id = SERVICE_TO_PIPELINE.get(service_type, "zar5aTjIKP8srIK5x0qk")  # Default: General Services
     return pipeline_id
 
-def create_ghl_opportunity(contact_id: str, data: dict):
+def is_missing_contact_response(response) -> bool:
+    """GHL indica que el contactId de la petición no existe"""
+    if response.status_code not in (400, 404, 422):
+        return False
+    text = response.text.lower()
+    return "contact" in text and ("not found" in text or "does not exist" in text)
+
+async def create_ghl_opportunity(contact_id: str, data: dict):
     """
     Crea una Oportunidad en GoHighLevel para un contacto existente
     """
@@ -71,10 +97,9 @@ def create_ghl_opportunity(contact_id: str, data: dict):
         # Extraer nombre del contacto para el título
         contact_name = data.get("name", "")
         if not contact_name:
-            for key in data.keys():
-                if key.startswith('dmform-0'):
-                    contact_name = data.get(key, "")
-                    break
+            name_key = plan_for(data).name_key
+            if name_key is not None:
+                contact_name = data.get(name_key, "")
         
         # Crear título más descriptivo
         if contact_name:
@@ -99,32 +124,37 @@ def create_ghl_opportunity(contact_id: str, data: dict):
             "monetaryValue": 0
         }
         
-        logger.info(f"📤 Creando Oportunidad: {opportunity_payload}")
+        logger.info("📤 Creando Oportunidad", extra={"event": "ghl_request", "payload": opportunity_payload})
         
-        headers = {
-            "Authorization": f"Bearer {GHL_API_KEY}",
-            "Version": "2021-07-28",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            f"{GHL_API_BASE}/opportunities/",
-            json=opportunity_payload,
-            headers=headers,
-            timeout=30
+        response = await ghl_request(
+            "POST",
+            "/opportunities/",
+            endpoint="opportunities",
+            json=opportunity_payload
         )
         
         logger.info(f"📊 Opportunity Response Status: {response.status_code}")
-        logger.info(f"📊 Opportunity Response: {response.text}")
+        logger.info("📊 Opportunity Response", extra={"event": "ghl_response", "body": response.text})
         
         if response.status_code in [200, 201]:
             result = response.json()
             logger.info(f"✅ Oportunidad creada: {result.get('opportunity', {}).get('id', 'unknown')}")
             return result
+        elif is_missing_contact_response(response):
+            # El contactId compartido ya no existe: que el próximo envío lo resuelva de nuevo
+            contact_resolutions.forget(submission_contact_key(data))
+            logger.warning(f"⚠️ Contacto {contact_id} ya no existe en GHL")
+            return None
         else:
-            logger.error(f"❌ Error creando oportunidad: {response.text}")
+            logger.error(
+                "❌ Error creando oportunidad",
+                extra={"event": "ghl_error", "status": response.status_code, "body": response.text}
+            )
             return None
         
+    except CircuitOpenError:
+        # Que llegue a webhook_submit como 503: la oportunidad no se intentó
+        raise
     except Exception as e:
         logger.error(f"❌ Error creando oportunidad: {str(e)}")
         return None
@@ -138,14 +168,14 @@ def extract_form_data(data: dict):
     origin = ""
     weight = ""
     
-    # Buscar destino en varios campos posibles
-    for key in data.keys():
-        value = str(data.get(key, "")).lower()
-        if "destination" in key.lower() or "destino" in key.lower():
+    # Buscar destino en varios campos posibles (solo los campos que el plan
+    # del layout marcó como relevantes)
+    for key, kind, is_weight in plan_for(data).location_fields:
+        if kind == KIND_DESTINATION:
             destination = data.get(key, "")
-        elif "origin" in key.lower() or "shipping" in key.lower() and "origin" in value:
+        elif kind == KIND_ORIGIN or kind == KIND_SHIPPING and "origin" in str(data.get(key, "")).lower():
             origin = data.get(key, "")
-        elif "cargo" in key.lower() or "weight" in key.lower() or "package" in key.lower() or "pallet" in key.lower():
+        elif is_weight:
             if not weight:  # Solo tomar el primero
                 weight = data.get(key, "")
     
@@ -155,207 +185,221 @@ def extract_form_data(data: dict):
         "weight": weight
     }
 
-def create_ghl_contact(data: dict):
+def build_contact_payload(data: dict) -> dict:
+    """
+    Arma el payload de contacto para GoHighLevel (nombre, tags y custom
+    fields) a partir de CUALQUIER dato del formulario, sin llamadas a GHL
+    """
+    # Extraer campos básicos si existen
+    email = data.get("email", "")
+    phone = data.get("phone", "")
+    service_type = data.get("service_type", "contact_form")
+    
+    # Plan de extracción del layout del formulario (cacheado por huella)
+    plan = plan_for(data)
+    
+    # Extraer NOMBRE - buscar en múltiples campos posibles
+    name = data.get("name", "")
+    if not name and plan.name_key is not None:
+        # Primer campo dmform-0, dmform-00, dmform-01, etc.
+        name = data.get(plan.name_key, "")
+        logger.info(f"📝 Nombre extraído de {plan.name_key}: {name}")
+    
+    # Si aún no hay nombre, usar Unknown
+    if not name:
+        name = "Unknown"
+        logger.warning("⚠️ No se encontró nombre en los datos")
+    
+    # Preparar payload mínimo para GoHighLevel
+    ghl_payload = {
+        "locationId": GHL_LOCATION_ID,
+        "source": "Website - jetcargo.us"
+    }
+    
+    # Agregar campos solo si existen y no están vacíos
+    if email:
+        ghl_payload["email"] = email
+    if name:
+        # Dividir nombre en firstName y lastName
+        parts = name.split()
+        ghl_payload["firstName"] = parts[0] if parts else "Unknown"
+        ghl_payload["lastName"] = " ".join(parts[1:]) if len(parts) > 1 else ""
+    if phone:
+        ghl_payload["phone"] = phone
+    
+    # Convertir TODOS los campos del formulario en TAGS
+    tags = []
+    
+    # Tag principal: Servicio
+    service_tag = service_type.replace("_", " ").title()
+    tags.append(service_tag)
+    
+    # Si hay all_fields, expandirlo primero
+    all_fields_data = {}
+    if "all_fields" in data and isinstance(data["all_fields"], dict):
+        all_fields_data = data["all_fields"]
+        # Remover all_fields de data para no procesarlo como tag
+        data_to_process = {k: v for k, v in data.items() if k != "all_fields"}
+        # Agregar los campos de all_fields a data_to_process
+        data_to_process.update(all_fields_data)
+    else:
+        data_to_process = data
+    
+    # Convertir cada campo del formulario en un tag individual
+    for key, label in plan.tag_fields:
+        value = data_to_process[key]
+        if value:
+            # Crear tag en formato "Label: Valor"
+            tag_text = f"{label}: {value}"
+            # Limitar longitud del tag (GoHighLevel tiene límites)
+            if len(tag_text) > 50:
+                tag_text = tag_text[:47] + "..."
+            tags.append(tag_text)
+    
+    ghl_payload["tags"] = tags
+    
+    # También guardar service_type como custom field para referencia
+    custom_fields = [{
+        "key": "service_type",
+        "field_value": service_type
+    }]
+    
+    ghl_payload["customFields"] = custom_fields
+    
+    return ghl_payload
+
+async def post_ghl_contact(data: dict) -> dict:
+    """
+    POST /contacts/ con los datos del formulario
+
+    Returns:
+        {"contact_id": str | None, "duplicate": bool, "result": respuesta de
+        GHL si el contacto se creó}
+    """
+    ghl_payload = build_contact_payload(data)
+    
+    logger.info("📤 Enviando a GoHighLevel", extra={"event": "ghl_request", "payload": ghl_payload})
+    
+    # Enviar a GoHighLevel
+    response = await ghl_request(
+        "POST",
+        "/contacts/",
+        endpoint="contacts",
+        json=ghl_payload
+    )
+    
+    logger.info(f"📊 GHL Response Status: {response.status_code}")
+    logger.info("📊 GHL Response", extra={"event": "ghl_response", "body": response.text})
+    
+    # Si es duplicado (400), el contacto ya existe: se devuelve su ID
+    if response.status_code == 400 and "duplicate" in response.text.lower():
+        logger.warning("⚠️ Contacto duplicado detectado - Creando Oportunidad")
+        metrics.ghl_contacts.inc("duplicate")
+        
+        # Extraer el ID del contacto duplicado de la respuesta
+        contact_id = None
+        try:
+            contact_id = response.json().get("meta", {}).get("contactId")
+        except Exception as e:
+            logger.warning(f"⚠️ Error procesando duplicado: {str(e)}")
+        return {"contact_id": contact_id, "duplicate": True, "result": None}
+    
+    response.raise_for_status()
+    result = response.json()
+    
+    logger.info(f"✅ Contacto creado: {result.get('contact', {}).get('id', 'unknown')}")
+    metrics.ghl_contacts.inc("created")
+    return {"contact_id": result.get("contact", {}).get("id"), "duplicate": False, "result": result}
+
+async def create_ghl_contact(data: dict):
     """
     Crea un contacto en GoHighLevel con CUALQUIER dato que venga
     Si el contacto ya existe, crea una Oportunidad
+    
+    Los envíos del mismo contacto dentro de CONTACT_MERGE_WINDOW comparten
+    la resolución: el segundo usa el contactId del primero (sin repetir el
+    POST /contacts/) y solo crea su oportunidad.
     """
     try:
-        # Extraer campos básicos si existen
-        email = data.get("email", "")
-        phone = data.get("phone", "")
-        service_type = data.get("service_type", "contact_form")
-        
-        # Extraer NOMBRE - buscar en múltiples campos posibles
-        name = data.get("name", "")
-        if not name:
-            # Buscar en dmform-0, dmform-00, dmform-1, etc.
-            for key in data.keys():
-                if key.startswith('dmform-0') or key == 'dmform-0' or key == 'dmform-00':
-                    name = data.get(key, "")
-                    logger.info(f"📝 Nombre extraído de {key}: {name}")
-                    break
-        
-        # Si aún no hay nombre, usar Unknown
-        if not name:
-            name = "Unknown"
-            logger.warning("⚠️ No se encontró nombre en los datos")
-        
-        # Preparar payload mínimo para GoHighLevel
-        ghl_payload = {
-            "locationId": GHL_LOCATION_ID,
-            "source": "Website - jetcargo.us"
-        }
-        
-        # Agregar campos solo si existen y no están vacíos
-        if email:
-            ghl_payload["email"] = email
-        if name:
-            # Dividir nombre en firstName y lastName
-            parts = name.split()
-            ghl_payload["firstName"] = parts[0] if parts else "Unknown"
-            ghl_payload["lastName"] = " ".join(parts[1:]) if len(parts) > 1 else ""
-        if phone:
-            ghl_payload["phone"] = phone
-        
-        # Convertir TODOS los campos del formulario en TAGS
-        tags = []
-        
-        # Tag principal: Servicio
-        service_tag = service_type.replace("_", " ").title()
-        tags.append(service_tag)
-        
-        # Mapeo de nombres de campos a etiquetas legibles
-        field_labels = {
-            "destination": "Destino",
-            "origin": "Origen",
-            "weight": "Peso",
-            "kilo": "Kilos",
-            "lb": "Lbs",
-            "cargo": "Carga",
-            "package": "PCS",
-            "pallet": "Pallets",
-            "pcs": "PCS",
-            "pieces": "PCS",
-            "company": "Empresa",
-            "shipping": "Envío",
-            "description": "Descripción",
-            "goods": "Mercancía",
-            "handling": "Handling",
-            "special": "Especial",
-            "hub": "Hub",
-            "consolidation": "Consolidación"
-        }
-        
-        # Si hay all_fields, expandirlo primero
-        all_fields_data = {}
-        if "all_fields" in data and isinstance(data["all_fields"], dict):
-            all_fields_data = data["all_fields"]
-            # Remover all_fields de data para no procesarlo como tag
-            data_to_process = {k: v for k, v in data.items() if k != "all_fields"}
-            # Agregar los campos de all_fields a data_to_process
-            data_to_process.update(all_fields_data)
+        key = submission_contact_key(data)
+        if key is None or CONTACT_MERGE_WINDOW <= 0:
+            resolved, shared = await post_ghl_contact(data), False
         else:
-            data_to_process = data
-        
-        # Convertir cada campo del formulario en un tag individual
-        for key, value in data_to_process.items():
-            if key not in ["email", "name", "phone", "service_type"] and value:
-                # Buscar etiqueta legible
-                label = None
-                for field_key, field_label in field_labels.items():
-                    if field_key in key.lower():
-                        label = field_label
-                        break
-                
-                # Si no hay etiqueta, usar el key original limpio
-                if not label:
-                    label = key.replace("_", " ").replace("-", " ").replace("dmform", "Campo").title()
-                
-                # Crear tag en formato "Label: Valor"
-                tag_text = f"{label}: {value}"
-                # Limitar longitud del tag (GoHighLevel tiene límites)
-                if len(tag_text) > 50:
-                    tag_text = tag_text[:47] + "..."
-                tags.append(tag_text)
+            resolved, shared = await contact_resolutions.run(
+                key, CONTACT_MERGE_WINDOW, lambda: post_ghl_contact(data)
+            )
         
-        ghl_payload["tags"] = tags
+        if shared:
+            metrics.ghl_contact_resolutions_shared.inc()
+            logger.info(f"🔗 contactId compartido con un envío reciente: {resolved['contact_id']}")
+        elif not resolved["duplicate"]:
+            return resolved["result"]
+        
+        contact_id = resolved["contact_id"]
+        if not contact_id:
+            logger.warning("⚠️ No se pudo extraer contactId")
+            return {
+                "status": "duplicate_ignored",
+                "message": "Duplicate contact, form submission recorded"
+            }
         
-        # También guardar service_type como custom field para referencia
-        custom_fields = [{
-            "key": "service_type",
-            "field_value": service_type
-        }]
+        logger.info(f"✅ Contacto ya existe en GHL: {contact_id}")
         
-        ghl_payload["customFields"] = custom_fields
+        # CREAR OPORTUNIDAD para el contacto existente
+        opportunity_result = await create_ghl_opportunity(contact_id, data)
         
-        logger.info(f"📤 Enviando a GoHighLevel: {ghl_payload}")
+        if opportunity_result:
+            logger.info(f"✅ Oportunidad creada para contacto existente")
+            return {
+                "contact": {
+                    "id": contact_id
+                },
+                "opportunity": opportunity_result,
+                "status": "duplicate_opportunity_created",
+                "message": "Contact already exists, new opportunity created"
+            }
         
-        # Enviar a GoHighLevel
-        headers = {
-            "Authorization": f"Bearer {GHL_API_KEY}",
-            "Version": "2021-07-28",
-            "Content-Type": "application/json"
+        logger.warning("⚠️ No se pudo crear oportunidad, pero formulario registrado")
+        return {
+            "contact": {
+                "id": contact_id
+            },
+            "status": "duplicate_ignored",
+            "message": "Contact already exists, form submission recorded"
         }
         
-        response = requests.post(
-            f"{GHL_API_BASE}/contacts/",
-            json=ghl_payload,
-            headers=headers,
-            timeout=30
-        )
-        
-        logger.info(f"📊 GHL Response Status: {response.status_code}")
-        logger.info(f"📊 GHL Response: {response.text}")
-        
-        # Si es duplicado (400), crear Oportunidad en su lugar
-        if response.status_code == 400 and "duplicate" in response.text.lower():
-            logger.warning("⚠️ Contacto duplicado detectado - Creando Oportunidad")
-            
-            # Extraer el ID del contacto duplicado de la respuesta
-            try:
-                import json
-                error_data = json.loads(response.text)
-                contact_id = error_data.get("meta", {}).get("contactId")
-                
-                if contact_id:
-                    logger.info(f"✅ Contacto ya existe en GHL: {contact_id}")
-                    
-                    # CREAR OPORTUNIDAD para el contacto existente
-                    opportunity_result = create_ghl_opportunity(contact_id, data)
-                    
-                    if opportunity_result:
-                        logger.info(f"✅ Oportunidad creada para contacto existente")
-                        return {
-                            "contact": {
-                                "id": contact_id
-                            },
-                            "opportunity": opportunity_result,
-                            "status": "duplicate_opportunity_created",
-                            "message": "Contact already exists, new opportunity created"
-                        }
-                    else:
-                        logger.warning("⚠️ No se pudo crear oportunidad, pero formulario registrado")
-                        return {
-                            "contact": {
-                                "id": contact_id
-                            },
-                            "status": "duplicate_ignored",
-                            "message": "Contact already exists, form submission recorded"
-                        }
-                else:
-                    logger.warning("⚠️ No se pudo extraer contactId")
-                    return {
-                        "status": "duplicate_ignored",
-                        "message": "Duplicate contact, form submission recorded"
-                    }
-            except Exception as e:
-                logger.warning(f"⚠️ Error procesando duplicado: {str(e)}")
-                return {
-                    "status": "duplicate_ignored",
-                    "message": "Duplicate contact, form submission recorded"
-                }
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        logger.info(f"✅ Contacto creado: {result.get('contact', {}).get('id', 'unknown')}")
-        return result
-        
     except Exception as e:
         logger.error(f"❌ Error creando contacto: {str(e)}")
         raise
 
+# Un lock por contacto (hash de email/teléfono normalizado)
+contact_locks = ContactLocks()
+
+# Ventana en la que se comparten resultados: el contactId entre envíos del
+# mismo contacto y la respuesta completa entre envíos idénticos del mismo
+# formulario (doble clic, varias pestañas), que así crean una sola oportunidad
+CONTACT_MERGE_WINDOW = float(os.getenv("CONTACT_MERGE_WINDOW", "10"))
+contact_resolutions = IdempotencyStore(max_entries=10_000)
+form_results = IdempotencyStore(max_entries=10_000)
+
 @app.post("/webhook/submit")
 async def webhook_submit(request: Request):
     """
     Endpoint que acepta CUALQUIER dato en formato JSON
     """
     try:
-        # Obtener datos raw
-        data = await request.json()
+        # Obtener datos raw (tipo y tamaño se comprueban antes de leerlo)
+        try:
+            with span("parse"):
+                data = await read_json_body(request)
+        except BodyError as e:
+            logger.warning(f"⚠️ Cuerpo rechazado ({e.status_code}): {e.message}")
+            return JSONResponse(
+                status_code=e.status_code,
+                content={"status": "error", "message": e.message}
+            )
         
-        logger.info(f"📥 Datos recibidos: {data}")
+        logger.info("📥 Datos recibidos", extra={"event": "payload_received", "payload": data})
         
         # Si no hay datos, rechazar
         if not data:
@@ -365,10 +409,32 @@ async def webhook_submit(request: Request):
                 content={"status": "error", "message": "No data received"}
             )
         
-        # Crear contacto en GoHighLevel (o Oportunidad si es duplicado)
-        result = create_ghl_contact(data)
+        if not isinstance(data, dict):
+            logger.error("❌ El cuerpo no es un objeto JSON")
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Expected a JSON object"}
+            )
+        
+        # Crear contacto en GoHighLevel (o Oportunidad si es duplicado).
+        # Las peticiones simultáneas de un mismo contacto pasan de a una, en
+        # orden de llegada: la segunda ve el duplicado en vez de crear otro.
+        async def deliver_form() -> dict:
+            async with contact_locks.hold(submission_contact_key(data)):
+                return await create_ghl_contact(data)
+        
+        replayed = False
+        if CONTACT_MERGE_WINDOW > 0:
+            result, replayed = await form_results.run(
+                payload_fingerprint(data), CONTACT_MERGE_WINDOW, deliver_form
+            )
+        else:
+            result = await deliver_form()
         
-        logger.info("✅ Formulario procesado exitosamente")
+        if replayed:
+            logger.info("ℹ️ Formulario repetido, se devuelve el resultado del primer envío")
+        else:
+            logger.info("✅ Formulario procesado exitosamente")
         
         return JSONResponse(
             status_code=200,
@@ -376,9 +442,21 @@ async def webhook_submit(request: Request):
                 "status": "success",
                 "message": "Contact created successfully",
                 "ghl_response": result
-            }
+            },
+            headers={"Idempotent-Replayed": "true"} if replayed else None
         )
         
+    except CircuitOpenError as e:
+        logger.error(f"🔌 GoHighLevel no disponible (circuito abierto): {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "error",
+                "message": "Servicio temporalmente no disponible. Intenta de nuevo en unos segundos."
+            },
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_in)))}
+        )
+    
     except Exception as e:
         logger.error(f"❌ Error procesando formulario: {str(e)}")
         return JSONResponse(
@@ -398,6 +476,44 @@ async def root():
         "version": "3.0-with-opportunities"
     }
 
+@app.get("/health")
+async def health_check():
+    """Health check con el estado del circuit breaker de GoHighLevel"""
+    return {
+        "status": "healthy" if breaker.state == "closed" else "degraded",
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "api_key_configured": bool(GHL_API_KEY),
+            "location_id_configured": bool(GHL_LOCATION_ID)
+        },
+        "event_loop": loop_monitor.snapshot(),
+        "admission": submit_admission.snapshot(),
+        "ghl_circuit_breaker": breaker.snapshot()
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas en formato Prometheus"""
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/admin/traces")
+async def admin_traces(request: Request, limit: int = 20):
+    """Trazas completas de las peticiones más lentas"""
+    if not admin_authorized(request.headers.get("X-Admin-Token")):
+        return JSONResponse(status_code=403, content={"status": "error", "message": "Forbidden"})
+    return {
+        "threshold_ms": slow_traces.threshold * 1000,
+        "recorded": slow_traces.recorded,
+        "traces": slow_traces.snapshot(limit)
+    }
+
+@app.get("/admin/loop-stalls")
+async def admin_loop_stalls(request: Request):
+    """Bloqueos recientes del event loop con el stack que los causó"""
+    if not admin_authorized(request.headers.get("X-Admin-Token")):
+        return JSONResponse(status_code=403, content={"status": "error", "message": "Forbidden"})
+    return {**loop_monitor.snapshot(), "recent": loop_monitor.recent_stalls()}
+
 @app.get("/jetcargo_integration.js")
 async def serve_integration_script():
     """Sirve el script de integración"""
@@ -408,6 +524,17 @@ async def serve_integration_script():
         headers={"Cache-Control": "no-cache"}
     )
 
+@app.on_event("startup")
+async def startup_event():
+    """Arranca el monitor de lag del event loop"""
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cierra el pool de conexiones con GoHighLevel"""
+    await loop_monitor.stop()
+    await close_client()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8080))